@@ -1,123 +1,117 @@
-import pymysql
 from pymysql import cursors
 import csv
 import traceback
 
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '',
-    'database': 'competitor_price_data',
-    'port': 3306
-}
+import db
+from price_store import CURRENT_TABLE, PRODUCTS_TABLE
 
 COMPETITORS = ['Cartpk', 'Diamond', 'Naheed', 'Metro']
 
 COMPARISON_TABLE = 'competitor_price_comparison'
 OUTPUT_CSV = 'competitor_price_comparison.csv'
 
+COMPARISON_COLUMNS = ['SKU', 'my_price', 'competitor', 'competitor_price', 'comparison']
 
-def fetch_data():
-    conn = pymysql.connect(**DB_CONFIG)
-    cursor = conn.cursor(cursors.DictCursor)
-    cursor.execute('SELECT * FROM unified_competitor_prices')
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return rows
+# The new comparison is built in a side table and swapped in with one RENAME,
+# so readers never see a half-filled table
+BUILD_TABLE = f'{COMPARISON_TABLE}_build'
+OLD_TABLE = f'{COMPARISON_TABLE}_old'
 
-def compare_prices(row):
-    results = {}
-    try:
-        my_price = float(row['my_price']) if row['my_price'] not in (None, '', 'None') else None
-    except Exception:
-        my_price = None
-    for comp in COMPETITORS:
-        comp_price_key = f'{comp}_price'
-        try:
-            comp_price = float(row[comp_price_key]) if row[comp_price_key] not in (None, '', 'None') else None
-        except Exception:
-            comp_price = None
-        if my_price is not None and comp_price is not None:
-            if my_price == comp_price:
-                results[f'compare_{comp.lower()}'] = ''
-            elif my_price > comp_price:
-                results[f'compare_{comp.lower()}'] = 'high'
-            else:
-                results[f'compare_{comp.lower()}'] = 'low'
-        else:
-            results[f'compare_{comp.lower()}'] = ''
-    return results
 
-def write_csv(data):
-    headers = ['SKU', 'my_price', 'competitor', 'competitor_price', 'comparison']
-    with open(OUTPUT_CSV, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=headers)
-        writer.writeheader()
-        for comp in COMPETITORS:
-            for row in data:
-                writer.writerow({
-                    'SKU': row['SKU'],
-                    'my_price': row.get('my_price', ''),
-                    'competitor': comp,
-                    'competitor_price': row.get(f'{comp}_price', ''),
-                    'comparison': row.get(f'compare_{comp.lower()}', '')
-                })
+def comparison_sql():
+    # One row per SKU and competitor, ordered like the CSV: 'high' / 'low'
+    # when my price is above / below the competitor's, '' when they are equal
+    # or either price is missing
+    competitors = ' UNION ALL '.join(['SELECT %s AS competitor, %s AS competitor_order'] * len(COMPETITORS))
+    return f"""
+        INSERT INTO {BUILD_TABLE} ({', '.join(COMPARISON_COLUMNS)})
+        SELECT p.sku, p.my_price, comp.competitor, c.price,
+               CASE
+                   WHEN p.my_price IS NULL OR c.price IS NULL OR p.my_price = c.price THEN ''
+                   WHEN p.my_price > c.price THEN 'high'
+                   ELSE 'low'
+               END
+        FROM ({competitors}) comp
+        CROSS JOIN {PRODUCTS_TABLE} p
+        LEFT JOIN {CURRENT_TABLE} c ON c.sku = p.sku AND c.competitor = comp.competitor
+        ORDER BY comp.competitor_order, p.sku
+    """
 
-def save_to_mysql(data):
-    conn = pymysql.connect(**DB_CONFIG)
+def check_schema(conn):
+    # The scrapers create and migrate the price tables; this script only reads them
+    required = [PRODUCTS_TABLE, CURRENT_TABLE]
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT TABLE_NAME FROM information_schema.TABLES "
+            f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({', '.join(['%s'] * len(required))})",
+            required
+        )
+        found = {row[0] for row in cursor.fetchall()}
+    missing = [table for table in required if table not in found]
+    if missing:
+        raise RuntimeError(
+            f"Missing price tables: {', '.join(missing)}. Run a scraper first to create them."
+        )
+
+def build_comparison(conn):
     cursor = conn.cursor()
     columns = [
         'id INT AUTO_INCREMENT PRIMARY KEY',
         'SKU VARCHAR(255)',
-        'my_price VARCHAR(50)',
+        'my_price DECIMAL(12, 2)',
         'competitor VARCHAR(50)',
-        'competitor_price VARCHAR(50)',
-        'comparison VARCHAR(10)'
+        'competitor_price DECIMAL(12, 2)',
+        'comparison VARCHAR(10)',
+        'KEY idx_sku (SKU)',
+        'KEY idx_competitor_comparison (competitor, comparison)'
     ]
-    create_table_sql = f"""
-        CREATE TABLE IF NOT EXISTS {COMPARISON_TABLE} (
+    # Leftovers of an interrupted run would make the CREATE or RENAME fail
+    cursor.execute(f"DROP TABLE IF EXISTS {BUILD_TABLE}, {OLD_TABLE}")
+    cursor.execute(f"""
+        CREATE TABLE {BUILD_TABLE} (
             {', '.join(columns)}
         )
-    """
-    cursor.execute(f"DROP TABLE IF EXISTS {COMPARISON_TABLE}")
-    cursor.execute(create_table_sql)
-    insert_cols = ['SKU', 'my_price', 'competitor', 'competitor_price', 'comparison']
-    placeholders = ','.join(['%s'] * len(insert_cols))
-    insert_sql = f"INSERT INTO {COMPARISON_TABLE} ({', '.join(insert_cols)}) VALUES ({placeholders})"
-    for comp in COMPETITORS:
-        for row in data:
-            values = [
-                row['SKU'],
-                row.get('my_price', ''),
-                comp,
-                row.get(f'{comp}_price', ''),
-                row.get(f'compare_{comp.lower()}', '')
-            ]
-            cursor.execute(insert_sql, values)
+    """)
+    params = [value for order, comp in enumerate(COMPETITORS) for value in (comp, order)]
+    cursor.execute(comparison_sql(), params)
+    count = cursor.rowcount
     conn.commit()
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {COMPARISON_TABLE} LIKE {BUILD_TABLE}")
+    cursor.execute(f"RENAME TABLE {COMPARISON_TABLE} TO {OLD_TABLE}, {BUILD_TABLE} TO {COMPARISON_TABLE}")
+    cursor.execute(f"DROP TABLE {OLD_TABLE}")
     cursor.close()
-    conn.close()
+    return count
+
+def write_csv(conn):
+    # Streamed from the server, so the whole comparison is never held in memory
+    with conn.cursor(cursors.SSDictCursor) as cursor:
+        cursor.execute(f"SELECT {', '.join(COMPARISON_COLUMNS)} FROM {COMPARISON_TABLE} ORDER BY id")
+        with open(OUTPUT_CSV, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=COMPARISON_COLUMNS)
+            writer.writeheader()
+            for row in cursor:
+                writer.writerow({key: '' if value is None else value for key, value in row.items()})
 
 def main():
     try:
-        print('Fetching data from MySQL...')
-        rows = fetch_data()
-        print(f'Fetched {len(rows)} rows.')
-        # Compare prices
-        for row in rows:
-            row.update(compare_prices(row))
-        # Write to CSV
-        print('Writing comparison CSV...')
-        write_csv(rows)
-        print(f'Comparison CSV saved as {OUTPUT_CSV}')
-        # Save to MySQL
-        print('Saving comparison data to MySQL...')
-        save_to_mysql(rows)
-        print(f'Comparison data saved to table: {COMPARISON_TABLE}')
+        if not db.get_pool().health_check():
+            print('Error: MySQL is not reachable, check MYSQL_DSN in scraper_config.py')
+            return
+        with db.connection() as conn:
+            check_schema(conn)
+            # Compare prices in the database
+            print('Comparing prices in MySQL...')
+            count = build_comparison(conn)
+            print(f'Comparison data saved to table: {COMPARISON_TABLE} ({count} rows)')
+            # Write to CSV
+            print('Writing comparison CSV...')
+            write_csv(conn)
+            print(f'Comparison CSV saved as {OUTPUT_CSV}')
+    except RuntimeError as e:
+        print('Error:', e)
     except Exception as e:
         print('Error:', e)
         traceback.print_exc()
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
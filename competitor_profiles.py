@@ -0,0 +1,216 @@
+import logging
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+import soupsieve
+
+from metro_fetcher import extract_next_data, find_product_price
+from parser_backend import make_soup, resolve_charset
+import price_patterns
+from scraper_config import COMPETITOR_PROFILES, DEFAULT_PRICE_RANGE, PRESCAN_WINDOW
+from selector_stats import SelectorStats, NEXT_DATA, PAGE_TEXT, STRUCTURED_DATA
+from stream_fetch import StreamScanner, find_marker, marker_pattern
+from structured_data import STREAM_SIGNALS, structured_prices
+
+logger = logging.getLogger(__name__)
+
+
+class CompetitorProfile:
+    """
+    A competitor's extraction settings from COMPETITOR_PROFILES, compiled once:
+    every CSS selector is compiled with soupsieve and the price pattern with re,
+    so extracting a price never recompiles anything.
+
+    `extract_price` tries, in order: the embedded Next.js JSON, schema.org
+    structured data (JSON-LD / microdata), the detail selectors, the selectors
+    (most successful first when `selector_stats` is given), the main content
+    containers and finally the whole page text. The selectors are first run on
+    a small window after the profile's markers, so most pages never need a
+    tree of the full document.
+    """
+
+    def __init__(self, name: str, settings: dict):
+        self.name = name
+        self.detail_selectors: List[str] = list(settings.get('detail_selectors', []))
+        # dict.fromkeys drops duplicates but keeps the configured order
+        self.selectors: List[str] = list(dict.fromkeys(settings.get('selectors', [])))
+        self.main_content_selectors: List[str] = list(settings.get('main_content_selectors', []))
+        self.data_attributes: List[str] = list(settings.get('data_attributes', []))
+        self.text_length: Optional[Tuple[int, int]] = tuple(settings['text_length']) if settings.get('text_length') else None
+        self.json_price_keys: Tuple[str, ...] = tuple(settings.get('json_price_keys', ()))
+        self.structured_data: bool = settings.get('structured_data', True)
+        markers = [marker.encode('utf-8') for marker in settings.get('markers', [])]
+        self.marker_re = marker_pattern(markers) if markers else None
+        pattern = settings.get('price_pattern')
+        self.price_re = re.compile(pattern, re.IGNORECASE) if pattern else price_patterns.PRICE_RE
+        self.min_price, self.max_price = settings.get('price_range', DEFAULT_PRICE_RANGE)
+        self.compiled = {
+            selector: soupsieve.compile(selector)
+            for selector in self.detail_selectors + self.selectors + self.main_content_selectors
+        }
+
+    @property
+    def all_selectors(self) -> List[str]:
+        return list(self.compiled)
+
+    def stream_scanner(self) -> StreamScanner:
+        """
+        Scanner that tells a streaming download when this profile's fast paths
+        can be tried on the bytes received so far
+        """
+        signals = STREAM_SIGNALS if self.structured_data else []
+        return StreamScanner(signals, self.marker_re, PRESCAN_WINDOW)
+
+    def is_valid_price(self, price_str: str) -> bool:
+        """
+        Validate if a string represents a price within this competitor's range
+        """
+        try:
+            price = float(price_str.replace(',', ''))
+            return self.min_price <= price <= self.max_price
+        except (ValueError, TypeError):
+            return False
+
+    def extract_price_from_text(self, text: str) -> Optional[str]:
+        """
+        Best valid price in the text, using this competitor's price pattern
+        """
+        return price_patterns.extract_price_from_text(text, self.is_valid_price, self.price_re)
+
+    def extract_price(self, html_content: Union[bytes, str], parser_backend: Optional[str] = None,
+                      selector_stats: Optional[SelectorStats] = None, partial: bool = False,
+                      encoding: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Extract a price from HTML content. Returns (price, label) where label is
+        the selector or tier that produced it, or (None, None).
+        With `partial=True` the content is only the start of a page still being
+        downloaded, and only the tiers that can't be fooled by the missing rest
+        (JSON, structured data and the marker window) are tried.
+
+        The page is worked on as raw bytes: the tiers scan the bytes, the parser
+        decodes them with `encoding` (resolved from the page's <meta> charset
+        when not given) and only matched snippets are decoded in Python.
+        """
+        if isinstance(html_content, str):
+            # Text from a caller that already decoded the page
+            html_content, encoding = html_content.encode('utf-8'), 'utf-8'
+        encoding = encoding or resolve_charset(None, html_content)
+
+        # Embedded Next.js JSON has to be read before the script tags are stripped
+        if self.json_price_keys:
+            next_data = extract_next_data(html_content)
+            if next_data is not None:
+                price = find_product_price(next_data, price_keys=self.json_price_keys)
+                if price and self.is_valid_price(price):
+                    logger.debug(f"Found {self.name} price in __NEXT_DATA__: {price}")
+                    return price_patterns.format_price(price), NEXT_DATA
+
+        # schema.org Product / Offer data, found without building a tree
+        if self.structured_data:
+            for candidate in structured_prices(html_content, encoding):
+                price = self.extract_price_from_text(candidate)
+                if price:
+                    logger.debug(f"Found {self.name} price in structured data: {price}")
+                    return price_patterns.format_price(price), STRUCTURED_DATA
+
+        # Fast path: run the selectors on a small window around a price marker
+        window = self.marker_window(html_content)
+        if window is not None:
+            soup = make_soup(window, parser_backend, encoding)
+            price, label = self._extract_from_soup(soup, selector_stats, full_page=False)
+            if price:
+                return price, label
+
+        if partial:
+            return None, None
+        return self._extract_from_soup(make_soup(html_content, parser_backend, encoding), selector_stats)
+
+    def marker_window(self, html_content: bytes) -> Optional[bytes]:
+        """
+        The markup from the first tag carrying a marker, PRESCAN_WINDOW bytes
+        long and cut at a tag boundary, or None if no tag does. Markers in
+        inline scripts, styles and comments don't count.
+        """
+        if self.marker_re is None:
+            return None
+        start, _ = find_marker(self.marker_re, html_content)
+        if start is None:
+            return None
+        end = html_content.rfind(b'>', start, start + PRESCAN_WINDOW)
+        return html_content[start:end + 1] if end != -1 else html_content[start:start + PRESCAN_WINDOW]
+
+    def _extract_from_soup(self, soup, selector_stats: Optional[SelectorStats],
+                           full_page: bool = True) -> Tuple[Optional[str], Optional[str]]:
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.decompose()
+
+        for selector in self.detail_selectors:
+            price_tag = self.compiled[selector].select_one(soup)
+            if price_tag:
+                price = self.extract_price_from_text(price_tag.get_text(strip=True))
+                if price:
+                    logger.debug(f"Found {self.name} price using detail selector '{selector}': {price}")
+                    return price_patterns.format_price(price), selector
+
+        selectors = selector_stats.ordered(self.name, self.selectors) if selector_stats else self.selectors
+        for selector in selectors:
+            for element in self.compiled[selector].select(soup):
+                text = element.get_text(strip=True)
+                # Skip very short or very long text
+                if self.text_length and not self.text_length[0] <= len(text) <= self.text_length[1]:
+                    continue
+
+                for attribute in self.data_attributes:
+                    if element.has_attr(attribute):
+                        price = str(element[attribute])
+                        if self.is_valid_price(price):
+                            logger.debug(f"Found {self.name} price in {attribute}: {price}")
+                            return price_patterns.format_price(price), selector
+
+                price = self.extract_price_from_text(text)
+                if price:
+                    logger.debug(f"Found {self.name} price in selector '{selector}': {price}")
+                    return price_patterns.format_price(price), selector
+
+        # A window is only trusted through the selectors; the broad searches
+        # below need the whole page
+        if not full_page:
+            return None, None
+
+        # Broader search in the main content area, avoiding header/footer
+        for selector in self.main_content_selectors:
+            main_content = self.compiled[selector].select_one(soup)
+            if main_content:
+                price = self.extract_price_from_text(main_content.get_text())
+                if price:
+                    logger.debug(f"Found {self.name} price in main content '{selector}': {price}")
+                    return price_patterns.format_price(price), selector
+
+        # Final fallback: search entire page
+        price = self.extract_price_from_text(soup.get_text())
+        if price:
+            return price_patterns.format_price(price), PAGE_TEXT
+        return None, None
+
+
+# Compiled profiles by competitor name, filled by get_profile
+_profiles: Dict[str, CompetitorProfile] = {}
+
+
+def get_profile(name: str) -> CompetitorProfile:
+    """
+    Compiled profile for a competitor. A competitor without an entry in
+    COMPETITOR_PROFILES gets an empty profile (whole page text only).
+    """
+    profile = _profiles.get(name)
+    if profile is None:
+        profile = _profiles[name] = CompetitorProfile(name, COMPETITOR_PROFILES.get(name, {}))
+    return profile
+
+
+def load_profiles() -> Dict[str, CompetitorProfile]:
+    """
+    Compile every configured profile; called once when a scraper starts
+    """
+    return {name: get_profile(name) for name in COMPETITOR_PROFILES}
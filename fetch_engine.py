@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from rate_limiter import DomainRateLimiter
+from scraper_config import HOST_CONCURRENCY, DEFAULT_HOST_CONCURRENCY, FETCH_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+def get_host(url: str) -> str:
+    """
+    Return the host of a URL without a leading 'www.'
+    """
+    host = urlparse(url).netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    return host
+
+
+class AsyncFetchEngine:
+    """
+    Run many scrape calls concurrently on an asyncio loop while capping the
+    number of in-flight requests to each competitor host and pacing each host
+    with its own token bucket. Waiting on one host never holds up the others.
+
+    The scrape function wraps the scraper's existing blocking `scrape_price`
+    (requests / Selenium), so it is executed on a worker thread pool. It is
+    called with each job's key and URL, so jobs sharing a URL stay apart.
+    """
+
+    def __init__(self, scrape_func: Callable[[Any, str], Optional[str]],
+                 host_limits: Optional[Dict[str, int]] = None,
+                 default_limit: int = DEFAULT_HOST_CONCURRENCY,
+                 max_workers: int = FETCH_WORKERS,
+                 rate_limiter: Optional[DomainRateLimiter] = None):
+        self.scrape_func = scrape_func
+        self.rate_limiter = rate_limiter or DomainRateLimiter()
+        self.host_limits = dict(HOST_CONCURRENCY)
+        if host_limits:
+            self.host_limits.update(host_limits)
+        self.default_limit = default_limit
+        self.max_workers = max_workers
+
+    def get_limit(self, host: str) -> int:
+        """
+        In-flight request limit for a host
+        """
+        return max(1, self.host_limits.get(host, self.default_limit))
+
+    async def _run_job(self, executor: ThreadPoolExecutor, semaphores: Dict[str, asyncio.Semaphore],
+                       key: Any, url: str, on_result: Optional[Callable[[Any, Optional[str]], None]]):
+        host = get_host(url)
+        if host not in semaphores:
+            semaphores[host] = asyncio.Semaphore(self.get_limit(host))
+        loop = asyncio.get_running_loop()
+        async with semaphores[host]:
+            await self.rate_limiter.acquire_async(host)
+            try:
+                price = await loop.run_in_executor(executor, self.scrape_func, key, url)
+            except Exception as e:
+                logger.error(f"Unhandled error fetching {url}: {e}")
+                price = None
+        if on_result:
+            on_result(key, price)
+        return key, price
+
+    async def _run_all(self, jobs: List[Tuple[Any, str]],
+                       on_result: Optional[Callable[[Any, Optional[str]], None]]) -> Dict[Any, Optional[str]]:
+        semaphores: Dict[str, asyncio.Semaphore] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            tasks = [self._run_job(executor, semaphores, key, url, on_result) for key, url in jobs]
+            results = await asyncio.gather(*tasks)
+        return dict(results)
+
+    def run(self, jobs: List[Tuple[Any, str]],
+            on_result: Optional[Callable[[Any, Optional[str]], None]] = None) -> Dict[Any, Optional[str]]:
+        """
+        Scrape every (key, url) job and return a {key: price} mapping.
+        `on_result(key, price)` is called as soon as each job finishes.
+        """
+        if not jobs:
+            return {}
+        logger.info(f"Fetching {len(jobs)} URLs across {len({get_host(url) for _, url in jobs})} host(s)...")
+        return asyncio.run(self._run_all(jobs, on_result))
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from scraper_config import HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = 'index.json'
+# Persist the index after this many new entries, not just at the end of a run
+SAVE_EVERY = 50
+
+
+class HttpCache:
+    """
+    On-disk cache of product pages keyed by URL.
+
+    Each entry keeps the body, the ETag / Last-Modified validators and the
+    price extracted from it. Requests are revalidated with If-None-Match /
+    If-Modified-Since; on a 304 the cached price is reused without downloading
+    or parsing the page again. Total body size is capped at `max_bytes`, evicting
+    the least recently used entries first. Every script uses its own `name`
+    (a subdirectory of `cache_dir`), as only one process may own a cache.
+    """
+
+    def __init__(self, name: str, cache_dir: str = HTTP_CACHE_DIR, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        self.cache_dir = os.path.join(cache_dir, name)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.unsaved = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.index: Dict[str, dict] = self._load_index()
+
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, INDEX_FILE)
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.body")
+
+    def _load_index(self) -> Dict[str, dict]:
+        try:
+            with open(self._index_path(), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (ValueError, OSError) as e:
+            logger.warning(f"Ignoring unreadable HTTP cache index: {e}")
+            return {}
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def lookup(self, url: str) -> Optional[dict]:
+        """
+        Cached entry for a URL, or None
+        """
+        with self.lock:
+            return self.index.get(self._key(url))
+
+    def conditional_headers(self, entry: Optional[dict]) -> Dict[str, str]:
+        """
+        Revalidation headers for a cached entry
+        """
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def get(self, session: requests.Session, url: str, **kwargs) -> Tuple[requests.Response, Optional[dict]]:
+        """
+        GET a URL with conditional revalidation. Returns (response, entry) where
+        `entry` is the cached entry if the server answered 304 Not Modified.
+        """
+        entry = self.lookup(url)
+        headers = dict(kwargs.pop('headers', None) or {})
+        headers.update(self.conditional_headers(entry))
+        response = session.get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and entry:
+            with self.lock:
+                entry['last_access'] = time.time()
+            return response, entry
+        return response, None
+
+    def read_body(self, entry: dict) -> Optional[bytes]:
+        """
+        Cached raw body for an entry, if still on disk (its charset is entry['encoding'])
+        """
+        try:
+            with open(self._body_path(entry['key']), 'rb') as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def store(self, url: str, response: requests.Response, price: Optional[str],
+              body: Optional[bytes] = None, encoding: Optional[str] = None):
+        """
+        Cache a successful response and the price extracted from it. Responses
+        without an ETag or Last-Modified can't be revalidated and are skipped.
+        `body` is the part of a streamed response that was read and `encoding`
+        its resolved charset, when the caller read the body itself.
+        """
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+        key = self._key(url)
+        if body is None:
+            body = response.content
+            encoding = response.encoding or response.apparent_encoding
+        else:
+            # A streamed body can't be re-read for charset detection
+            encoding = encoding or response.encoding
+        try:
+            with open(self._body_path(key), 'wb') as file:
+                file.write(body)
+        except OSError as e:
+            logger.warning(f"Could not write HTTP cache entry for {url}: {e}")
+            return
+        with self.lock:
+            self.index[key] = {
+                'key': key,
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+                'price': price,
+                'encoding': encoding,
+                'size': len(body),
+                'last_access': time.time(),
+            }
+            self._evict()
+            self.unsaved += 1
+            save_now = self.unsaved >= SAVE_EVERY
+        if save_now:
+            self.save()
+
+    def _evict(self):
+        # Caller holds self.lock
+        total = sum(entry['size'] for entry in self.index.values())
+        if total <= self.max_bytes:
+            return
+        for entry in sorted(self.index.values(), key=lambda e: e['last_access']):
+            if total <= self.max_bytes:
+                break
+            total -= entry['size']
+            del self.index[entry['key']]
+            try:
+                os.remove(self._body_path(entry['key']))
+            except OSError:
+                pass
+
+    def save(self):
+        """
+        Write the index to disk (atomically, so a crash never leaves it half written)
+        """
+        tmp_path = self._index_path() + '.tmp'
+        with self.lock:
+            self.unsaved = 0
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as file:
+                    json.dump(self.index, file)
+                os.replace(tmp_path, self._index_path())
+            except OSError as e:
+                logger.warning(f"Could not save HTTP cache index: {e}")
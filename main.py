@@ -1,20 +1,29 @@
+import argparse
 import csv
+import functools
 import requests
-from bs4 import BeautifulSoup
-import time
-import re
 from urllib.parse import urlparse
 import logging
 from typing import List, Dict, Optional, Tuple
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-import pymysql
 import traceback
+from requests.adapters import HTTPAdapter
+
+import db
+from fetch_engine import AsyncFetchEngine
+from http_cache import HttpCache
+from competitor_profiles import get_profile, load_profiles
+from metro_browser import fetch_product_price
+from metro_fetcher import MetroTieredFetcher
+from page_scraper import scrape_page_price
+from parse_pool import ParsePool, extractor_factory
+from parser_backend import get_parser_backend
+import price_patterns
+from rescrape_scheduler import RescrapeScheduler
+from scrape_journal import ScrapeJournal
+from scraper_config import FETCH_WORKERS
+from selector_stats import SelectorStats
+from price_store import create_schema, save_prices
+from webdriver_pool import WebDriverPool
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -31,242 +40,55 @@ class CompetitorPriceScraper:
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
+        # Keep enough pooled connections for the concurrent fetch engine
+        adapter = HTTPAdapter(pool_connections=FETCH_WORKERS, pool_maxsize=FETCH_WORKERS)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Product pages are revalidated against an on-disk cache between runs
+        self.http_cache = HttpCache('unified_competitor_prices')
+        # Parse worker processes, started by process_csv
+        self.parse_pool = None
+        # Chrome drivers for Metro are started on first use and reused across URLs
+        self.driver_pool = WebDriverPool()
+        # Selectors and price patterns for every competitor, compiled once
+        self.profiles = load_profiles()
+        metro_profile = self.profiles['Metro']
+        self.metro_fetcher = MetroTieredFetcher(self.session,
+                                                functools.partial(fetch_product_price, self.driver_pool, metro_profile),
+                                                metro_profile.is_valid_price, self.format_price, self.http_cache,
+                                                metro_profile.json_price_keys)
+        # BeautifulSoup tree builder (PARSER_BACKEND, falling back to html.parser)
+        self.parser_backend = get_parser_backend()
+        # Selectors that won most often in earlier runs are tried first
+        self.selector_stats = SelectorStats('unified_competitor_prices')
         self.unified_results = []
+        # (SKU, competitor) pairs whose last price was reused without scraping
+        self.reused_prices = set()
         self.competitor_names = []
         
     def extract_price_from_html(self, html_content: str, competitor_name: str) -> Optional[str]:
         """
         Extract price from HTML content based on competitor-specific patterns
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Common price patterns
-        price_patterns = [
-            r'Rs\.?\s*([\d,]+(?:\.\d{2})?)',
-            r'PKR\s*([\d,]+(?:\.\d{2})?)',
-            r'Price:\s*Rs\.?\s*([\d,]+(?:\.\d{2})?)',
-            r'[\d,]+(?:\.\d{2})?\s*Rs',
-            r'[\d,]+(?:\.\d{2})?\s*PKR',
-            r'Rs\s*([\d,]+(?:\.\d{2})?)',
-            r'PKR\s*([\d,]+(?:\.\d{2})?)',
-            r'([\d,]+(?:\.\d{2})?)\s*Rs',
-            r'([\d,]+(?:\.\d{2})?)\s*PKR',
-            # Metro specific patterns
-            r'[\d,]+(?:\.\d{2})?',
-            r'Price\s*:?\s*([\d,]+(?:\.\d{2})?)',
-            r'[\d,]+(?:\.\d{2})?\s*PKR',
-            r'PKR\s*([\d,]+(?:\.\d{2})?)'
-        ]
-        
-        # Competitor-specific selectors
-        competitor_selectors = {
-            'Cartpk': [
-                '.price', '.product-price', '.amount', '[class*="price"]',
-                '[class*="Price"]', '.current-price', '.regular-price',
-                '.product-details-price', '.price-box', '.price-wrapper'
-            ],
-            'Diamond': [
-                '.price', '.product-price', '.amount', '[class*="price"]',
-                '[class*="Price"]', '.current-price', '.regular-price',
-                '.product-details-price', '.price-box', '.price-wrapper'
-            ],
-            'Naheed': [
-                '.price', '.product-price', '.amount', '[class*="price"]',
-                '[class*="Price"]', '.current-price', '.regular-price',
-                '.product-details-price', '.price-box', '.price-wrapper'
-            ],
-            'Metro': [
-                '.price', '.product-price', '.amount', '[class*="price"]',
-                '[class*="Price"]', '.current-price', '.regular-price',
-                '.product-details-price', '.price-box', '.price-wrapper',
-                '.product-price-box', '.price-display', '.price-value',
-                '.product-price-value', '.price-amount', '.product-amount',
-                '[data-price]', '[data-amount]', '.cost', '.value',
-                '.product-cost', '.product-value', '.selling-price',
-                '.offer-price', '.discount-price', '.final-price'
-            ]
-        }
-        
-        # Special handling for Metro
-        if competitor_name == 'Metro':
-            logger.info(f"Debug: Analyzing Metro page structure")
-            
-            # First, try to extract price from JSON data in script tags (Metro stores prices here)
-            scripts = soup.find_all('script')
-            for script in scripts:
-                script_text = script.get_text()
-                if script_text:
-                    # Look for JSON data containing price information
-                    if '"price"' in script_text and '"sell_price"' in script_text:
-                        logger.info(f"Debug: Found Metro JSON data with prices")
-                        # Extract price from JSON
-                        price_match = re.search(r'"price":(\d+(?:\.\d+)?)', script_text)
-                        sell_price_match = re.search(r'"sell_price":(\d+(?:\.\d+)?)', script_text)
-                        
-                        if sell_price_match:
-                            price = sell_price_match.group(1)
-                            logger.info(f"Debug: Found Metro sell_price: {price}")
-                            if self.is_valid_price(price):
-                                return self.format_price(price)
-                        
-                        if price_match:
-                            price = price_match.group(1)
-                            logger.info(f"Debug: Found Metro price: {price}")
-                            if self.is_valid_price(price):
-                                return self.format_price(price)
-            
-            # Use the specific Metro price selector path provided by user
-            price_selector = "#__next > div > div.main-container > div > div.CategoryGrid_product_details_container_without_imageCarousel__xOYB6 > div.CategoryGrid_product_details_description_container__OjSn3 > p.CategoryGrid_product_details_price__dNQQQ"
-            price_tag = soup.select_one(price_selector)
-            
-            if price_tag:
-                price_text = price_tag.get_text(strip=True)
-                logger.info(f"Debug: Found Metro price using specific selector: '{price_text}'")
-                price = self.extract_price_from_text(price_text)
-                if price and self.is_valid_price(price):
-                    logger.info(f"Debug: Found Metro price: {price}")
-                    return self.format_price(price)
-            
-            # Also try the shorter class name as fallback
-            price_tag = soup.find("p", class_="CategoryGrid_product_details_price__dNQQQ")
-            if price_tag:
-                price_text = price_tag.get_text(strip=True)
-                logger.info(f"Debug: Found Metro price using class selector: '{price_text}'")
-                price = self.extract_price_from_text(price_text)
-                if price and self.is_valid_price(price):
-                    logger.info(f"Debug: Found Metro price: {price}")
-                    return self.format_price(price)
-            
-            # Fallback to other Metro selectors if the specific class is not found
-            metro_price_selectors = [
-                # Primary Metro selectors - focus on product areas
-                '.product-price', '.price-display', '.price-value',
-                '.product-price-value', '.price-amount', '.product-amount',
-                '.selling-price', '.offer-price', '.discount-price', '.final-price',
-                '.price-box', '.price-container', '.product-price-box',
-                '.price-wrapper', '.price-section', '.product-price-section',
-                # More specific Metro selectors
-                '.product-details-price', '.current-price', '.regular-price',
-                '.product-price-display', '.price-text', '.price-label',
-                # Generic price selectors
-                '.price', '.amount', '.product-price',
-                '[class*="price"]', '[class*="Price"]', '[class*="amount"]',
-                '[class*="Amount"]', '[class*="cost"]', '[class*="Cost"]',
-                # Data attributes
-                '[data-price]', '[data-amount]', '[data-value]',
-                # Additional Metro specific patterns
-                '.cost', '.value', '.product-cost', '.product-value',
-                # Metro specific product containers
-                '.product-details', '.product-info', '.product-summary',
-                '.product-description', '.product-content'
-            ]
-            
-            # First try to find price in specific Metro elements
-            for selector in metro_price_selectors:
-                elements = soup.select(selector)
-                for element in elements:
-                    text = element.get_text(strip=True)
-                    # Skip very short or very long text
-                    if len(text) < 3 or len(text) > 100:
-                        continue
-                    
-                    # Check for data attributes first
-                    if element.has_attr('data-price'):
-                        price = str(element['data-price'])
-                        if self.is_valid_price(price):
-                            logger.info(f"Debug: Found Metro price in data-price: {price}")
-                            return self.format_price(price)
-                    
-                    if element.has_attr('data-amount'):
-                        price = str(element['data-amount'])
-                        if self.is_valid_price(price):
-                            logger.info(f"Debug: Found Metro price in data-amount: {price}")
-                            return self.format_price(price)
-                    
-                    logger.info(f"Debug: Metro selector '{selector}' found text: '{text}'")
-                    price = self.extract_price_from_text(text)
-                    if price and self.is_valid_price(price):
-                        logger.info(f"Debug: Found Metro price in selector '{selector}': {price}")
-                        return price
-            
-            # If no price found in specific selectors, try broader search with better filtering
-            logger.info("Debug: No price found in specific selectors, trying broader search")
-            
-            # Focus on main content area, avoid header/footer
-            main_content_selectors = [
-                'main', '.main-content', '.content', '.product-content',
-                '.product-details', '.product-info', '.product-summary'
-            ]
-            
-            for main_selector in main_content_selectors:
-                main_content = soup.select_one(main_selector)
-                if main_content:
-                    # Search for price patterns in main content
-                    text = main_content.get_text()
-                    price = self.extract_price_from_text(text)
-                    if price and self.is_valid_price(price):
-                        logger.info(f"Debug: Found Metro price in main content: {price}")
-                        return self.format_price(price)
-            
-            # Final fallback: search entire page
-            text = soup.get_text()
-            price = self.extract_price_from_text(text)
-            if price and self.is_valid_price(price):
-                logger.info(f"Debug: Found Metro price in entire page: {price}")
-                return self.format_price(price)
-            
-            return None
-        
-        # For other competitors, use their specific selectors
-        if competitor_name in competitor_selectors:
-            for selector in competitor_selectors[competitor_name]:
-                elements = soup.select(selector)
-                for element in elements:
-                    text = element.get_text(strip=True)
-                    price = self.extract_price_from_text(text)
-                    if price and self.is_valid_price(price):
-                        return self.format_price(price)
-        
-        # Fallback: search entire text for price patterns
-        text = soup.get_text()
-        return self.extract_price_from_text(text)
+        price, _ = self.extract_price_with_selector(html_content, competitor_name)
+        return price
+
+    def extract_price_with_selector(self, html_content, competitor_name: str, partial: bool = False,
+                                    encoding: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Extract price from HTML content (raw bytes in `encoding`, or text) and
+        return it with the selector (or extraction tier) that produced it, for
+        the selector hit-rate stats. `partial` is set for the start of a page
+        that is still downloading.
+        """
+        profile = get_profile(competitor_name)
+        return profile.extract_price(html_content, self.parser_backend, self.selector_stats, partial, encoding)
 
     def extract_price_from_text(self, text: str) -> Optional[str]:
         """
-        Extract price from text using regex patterns
+        Extract price from text with the precompiled single-pass matcher
         """
-        # Remove extra whitespace and normalize
-        text = re.sub(r'\s+', ' ', text.strip())
-        
-        # Price patterns to try
-        patterns = [
-            r'Rs\.?\s*([\d,]+(?:\.\d{2})?)',
-            r'PKR\s*([\d,]+(?:\.\d{2})?)',
-            r'Price:\s*Rs\.?\s*([\d,]+(?:\.\d{2})?)',
-            r'([\d,]+(?:\.\d{2})?)\s*Rs',
-            r'([\d,]+(?:\.\d{2})?)\s*PKR',
-            r'Rs\s*([\d,]+(?:\.\d{2})?)',
-            r'PKR\s*([\d,]+(?:\.\d{2})?)',
-            r'([\d,]+(?:\.\d{2})?)',
-            r'Price\s*:?\s*([\d,]+(?:\.\d{2})?)',
-            r'[\d,]+(?:\.\d{2})?\s*PKR',
-            r'PKR\s*([\d,]+(?:\.\d{2})?)'
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                if isinstance(match, tuple):
-                    match = match[0]
-                price = match.replace(',', '')
-                if self.is_valid_price(price):
-                    return price
-        
-        return None
+        return price_patterns.extract_price_from_text(text, self.is_valid_price)
 
     def is_valid_price(self, price_str: str) -> bool:
         """
@@ -290,41 +112,32 @@ class CompetitorPriceScraper:
         except (ValueError, TypeError):
             return price_str
 
+    def parse_page(self, body: bytes, charset: Optional[str], competitor_name: str,
+                   partial: bool = False) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Extract (price, selector) from raw page bytes, on the parse worker
+        processes when they are running
+        """
+        if self.parse_pool is not None:
+            return self.parse_pool.parse(body, charset, competitor_name, partial)
+        return self.extract_price_with_selector(body, competitor_name, partial, encoding=charset)
+
     def scrape_price(self, url: str, competitor_name: str) -> Optional[str]:
         """
         Scrape price from a given URL for a specific competitor
         """
-        try:
-            logger.info(f"Scraping price from {competitor_name}: {url}")
-            
-            # Special handling for Metro using Selenium
-            if competitor_name == 'Metro':
-                return self.get_metro_price_selenium(url)
-            
-            # For other competitors, use requests
-            response = self.session.get(url, timeout=30)
-            
-            # Check for HTTP errors (404, 500, etc.)
-            if response.status_code >= 400:
-                logger.error(f"HTTP {response.status_code} error for {competitor_name}: {url}")
-                return None
-            
-            # Extract price from HTML
-            price = self.extract_price_from_html(response.text, competitor_name)
-            
-            if price:
-                logger.info(f"Found price for {competitor_name}: {price}")
-                return price
-            else:
-                logger.warning(f"No price found for {competitor_name}: {url}")
-                return None
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request error for {competitor_name}: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"Error scraping {competitor_name}: {e}")
-            return None
+        # Metro: embedded JSON over plain HTTP first, Selenium only as a fallback
+        if competitor_name == 'Metro':
+            logger.info(f"Scraping price from Metro: {url}")
+            return self.metro_fetcher.fetch_price(url)
+
+        # For other competitors, use requests
+        return scrape_page_price(
+            self.session, self.http_cache, url, competitor_name,
+            get_profile(competitor_name).stream_scanner(),
+            lambda body, charset, partial: self.parse_page(body, charset, competitor_name, partial),
+            self.selector_stats
+        )
 
     def get_competitor_name_from_url(self, url: str) -> str:
         """
@@ -341,51 +154,18 @@ class CompetitorPriceScraper:
         else:
             return 'Unknown'
 
-    def get_metro_price_selenium(self, url):
+    def process_csv(self, csv_file_path: str, resume: bool = False, full_refresh: bool = False):
         """
-        Get Metro price using Selenium (special handling for Metro)
-        """
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--window-size=1920,1080')
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        try:
-            driver.get(url)
-            wait = WebDriverWait(driver, 20)
-            # Try the specific product detail price selector first
-            try:
-                price_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'p.CategoryGrid_product_details_price__dNQQQ')))
-                price_text = price_elem.text.strip()
-                price = self.extract_price_from_text(price_text)
-                if price and self.is_valid_price(price):
-                    return self.format_price(price)
-            except Exception:
-                # Fallback: try all p.CategoryGrid_product_price__Svf8T elements and pick the lowest
-                price_elements = driver.find_elements(By.CSS_SELECTOR, 'p.CategoryGrid_product_price__Svf8T')
-                prices = []
-                for elem in price_elements:
-                    text = elem.text.strip()
-                    price = self.extract_price_from_text(text)
-                    if price and self.is_valid_price(price):
-                        prices.append(float(price))
-                if prices:
-                    min_price = min(prices)
-                    return f"{min_price:.2f}"
-            return None
-        except Exception as e:
-            logger.error(f"Selenium Metro error: {e}")
-            return None
-        finally:
-            driver.quit()
-
-    def process_csv(self, csv_file_path: str):
-        """
-        Process CSV file and create unified results structure
+        Process CSV file and create unified results structure.
+        Every price is journaled as soon as it is scraped; with `resume=True`
+        pairs already in the journal from an interrupted run are skipped.
+        Prices that are unlikely to have changed since the last run are reused
+        unless `full_refresh=True`.
         """
         logger.info("Starting to process CSV file...")
+        journal = ScrapeJournal('unified_competitor_prices', resume=resume)
+        schedule = RescrapeScheduler('unified_competitor_prices', full_refresh=full_refresh)
+        self.parse_pool = ParsePool(extractor_factory(self.parser_backend, 'unified_competitor_prices'))
         try:
             with open(csv_file_path, 'r', encoding='utf-8') as file:
                 reader = csv.reader(file)
@@ -401,6 +181,7 @@ class CompetitorPriceScraper:
                 
                 # Initialize unified results structure - create all products first
                 self.unified_results = []
+                self.reused_prices = set()
                 
                 # First pass: Create all product entries with SKU, my_price
                 logger.info("Creating product structure...")
@@ -424,47 +205,46 @@ class CompetitorPriceScraper:
                     self.unified_results.append(product_data)
                 logger.info(f"Created {len(self.unified_results)} product entries")
                 
-                # Process each competitor completely before moving to next
-                for comp_idx, comp_name in enumerate(self.competitor_names):
-                    logger.info(f"\n{'='*60}")
-                    logger.info(f"Processing competitor: {comp_name}")
-                    logger.info(f"{'='*60}")
-                    for row_idx, row in enumerate(rows[2:], start=3):
-                        if len(row) < 6:
-                            continue
-                        sku = row[0]
-                        if not sku or sku.strip() == '':
-                            continue
-                        # Find the corresponding product in unified_results
-                        existing_product = None
-                        for product in self.unified_results:
-                            if product['SKU'] == sku:
-                                existing_product = product
-                                break
-                        if existing_product is None:
-                            logger.warning(f"Product {sku} not found in unified_results")
-                            continue
-                        
-                        # Process competitor links
-                        product_link = existing_product[f'{comp_name}_link']
-                        if product_link and product_link.strip() != '':
-                            if row_idx > 3:
-                                time.sleep(5)
-                            logger.info(f"Processing SKU: {sku} for {comp_name}")
-                            price = self.scrape_price(product_link.strip(), comp_name)
-                            if price:
-                                existing_product[f'{comp_name}_price'] = price
-                                logger.info(f"✅ {comp_name} - {sku}: {price}")
-                            else:
-                                existing_product[f'{comp_name}_price'] = "None"
-                                logger.warning(f"❌ {comp_name} - {sku}: No price found (set to None)")
+                # Collect every competitor's links; products without a link are skipped.
+                # All competitors are scraped in one run so that waiting on one host's
+                # rate limit is spent working on the others.
+                jobs = []
+                for product_idx, product in enumerate(self.unified_results):
+                    for comp_name in self.competitor_names:
+                        product_link = product[f'{comp_name}_link']
+                        if journal.is_done(product['SKU'], comp_name):
+                            product[f'{comp_name}_price'] = journal.get_price(product['SKU'], comp_name) or "None"
+                            logger.info(f"⏭️ {comp_name} - {product['SKU']}: Already scraped (resumed from journal)")
+                        elif product_link and not schedule.is_due(product['SKU'], comp_name, product_link.strip()):
+                            product[f'{comp_name}_price'] = schedule.last_price(product['SKU'], comp_name) or "None"
+                            self.reused_prices.add((product['SKU'].strip(), comp_name))
+                            logger.info(f"⏭️ {comp_name} - {product['SKU']}: Price still fresh, reusing {product[f'{comp_name}_price']}")
+                        elif product_link and product_link.strip() != '':
+                            jobs.append(((product_idx, comp_name), product_link.strip()))
                         else:
-                            existing_product[f'{comp_name}_price'] = "None"
-                            logger.info(f"⏭️ {comp_name} - {sku}: No link provided (set to None)")
-                    logger.info(f"✅ Completed processing all products for {comp_name}")
-                    if comp_idx < len(self.competitor_names) - 1:
-                        logger.info("Waiting 10 seconds before processing next competitor...")
-                        time.sleep(10)
+                            product[f'{comp_name}_price'] = "None"
+                            logger.info(f"⏭️ {comp_name} - {product['SKU']}: No link provided (set to None)")
+                
+                def on_result(job_key, price):
+                    product_idx, comp_name = job_key
+                    existing_product = self.unified_results[product_idx]
+                    sku = existing_product['SKU']
+                    journal.record(sku, comp_name, price, existing_product[f'{comp_name}_link'])
+                    schedule.record(sku, comp_name, price, existing_product[f'{comp_name}_link'].strip())
+                    if price:
+                        existing_product[f'{comp_name}_price'] = price
+                        logger.info(f"✅ {comp_name} - {sku}: {price}")
+                    else:
+                        existing_product[f'{comp_name}_price'] = "None"
+                        logger.warning(f"❌ {comp_name} - {sku}: No price found (set to None)")
+                
+                # Fetch concurrently, bounded per host by HOST_CONCURRENCY and RATE_LIMITS
+                engine = AsyncFetchEngine(lambda job_key, url: self.scrape_price(url, job_key[1]))
+                engine.run(jobs, on_result=on_result)
+                self.metro_fetcher.log_stats()
+                self.http_cache.save()
+                for comp_name in self.competitor_names:
+                    self.selector_stats.log_report(comp_name, get_profile(comp_name).all_selectors)
                 logger.info(f"\n🎉 Completed processing all competitors!")
                 logger.info(f"Total products processed: {len(self.unified_results)}")
         except FileNotFoundError:
@@ -472,48 +252,28 @@ class CompetitorPriceScraper:
         except Exception as e:
             logger.error(f"Error processing CSV file: {str(e)}")
             traceback.print_exc()
+        finally:
+            journal.close()
+            schedule.save()
+            self.selector_stats.save()
+            self.parse_pool.close()
+            self.parse_pool = None
 
     def create_mysql_table(self):
         """
-        Create MySQL table with the unified structure
+        Create the MySQL price tables and the unified view
         """
         try:
             logger.info("Creating MySQL table...")
             
-            # Connect to MySQL
-            conn = pymysql.connect(
-                host="localhost",
-                user="root",
-                password="",
-                port=3306
-            )
-            
-            cursor = conn.cursor()
-            
             # Create database if not exists
-            cursor.execute("CREATE DATABASE IF NOT EXISTS competitor_price_data")
-            cursor.execute("USE competitor_price_data")
-            
-            # Create table with dynamic columns based on competitors
-            columns = ["id INT AUTO_INCREMENT PRIMARY KEY", "SKU VARCHAR(255)", "my_price VARCHAR(50)"]
-            
-            # Add competitor columns
-            for comp_name in self.competitor_names:
-                columns.append(f"{comp_name}_price VARCHAR(50)")
-                columns.append(f"{comp_name}_link TEXT")
+            db.get_pool().create_database()
             
-            create_table_query = f"""
-                CREATE TABLE IF NOT EXISTS unified_competitor_prices (
-                    {', '.join(columns)}
-                )
-            """
-            
-            cursor.execute(create_table_query)
+            with db.connection() as conn:
+                # Normalized price tables (migrating the old wide table once) and the unified view
+                create_schema(conn)
             logger.info("✅ MySQL table created successfully!")
             
-            cursor.close()
-            conn.close()
-            
         except Exception as e:
             logger.error(f"Error creating MySQL table: {e}")
             traceback.print_exc()
@@ -525,44 +285,12 @@ class CompetitorPriceScraper:
         try:
             logger.info("Saving data to MySQL...")
             
-            # Connect to MySQL
-            conn = pymysql.connect(
-                host="localhost",
-                user="root",
-                password="",
-                port=3306,
-                database="competitor_price_data"
-            )
-            
-            cursor = conn.cursor()
-            
-            # Prepare insert query
-            columns = ["SKU", "my_price"]
-            for comp_name in self.competitor_names:
-                columns.append(f"{comp_name}_price")
-                columns.append(f"{comp_name}_link")
-            
-            placeholders = ", ".join(["%s"] * len(columns))
-            insert_query = f"""
-                INSERT INTO unified_competitor_prices ({', '.join(columns)})
-                VALUES ({placeholders})
-            """
-            
-            # Insert data
-            for product in self.unified_results:
-                values = [product["SKU"], product["my_price"]]
-                for comp_name in self.competitor_names:
-                    values.append(product[f"{comp_name}_price"])
-                    values.append(product[f"{comp_name}_link"])
-                
-                cursor.execute(insert_query, values)
-            
-            conn.commit()
+            with db.connection() as conn:
+                # Batched writes of this run's prices, stamped with the save time
+                save_prices(conn, self.unified_results, self.competitor_names, update_my_price=True,
+                            reused=self.reused_prices)
             logger.info(f"✅ Saved {len(self.unified_results)} products to MySQL!")
             
-            cursor.close()
-            conn.close()
-            
         except Exception as e:
             logger.error(f"Error saving to MySQL: {e}")
             traceback.print_exc()
@@ -592,9 +320,16 @@ def main():
     """
     Main function to run the unified price scraping process
     """
+    parser = argparse.ArgumentParser(description="Unified Competitor Price Scraper")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip (SKU, competitor) pairs already scraped by an interrupted run")
+    parser.add_argument('--full-refresh', action='store_true',
+                        help="re-scrape every link, even prices that are still fresh")
+    args = parser.parse_args()
+    
     print("Unified Competitor Price Scraper")
     print("="*50)
-    print("📋 Processing order: One competitor at a time (all products)")
+    print("📋 Processing order: All competitors in parallel (paced per host)")
     print("📊 Output: Single CSV with unified structure")
     print("🗄️  Database: MySQL table with same structure")
     print("="*50)
@@ -604,7 +339,8 @@ def main():
     
     # Process the CSV file
     csv_file = "Cartpk competitors link(Developer Sample File).csv"
-    scraper.process_csv(csv_file)
+    scraper.process_csv(csv_file, resume=args.resume, full_refresh=args.full_refresh)
+    scraper.driver_pool.close()
     
     # Only proceed if we have results
     if scraper.unified_results:
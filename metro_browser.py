@@ -0,0 +1,336 @@
+import json
+import logging
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from competitor_profiles import CompetitorProfile
+from metro_fetcher import find_listing_prices, find_product_price, get_product_id
+import price_patterns
+from scraper_config import (
+    METRO_BROWSER_STATE_TIMEOUT, METRO_LISTING_PRICE_SELECTOR, METRO_MAX_TABS, METRO_TAB_MEMORY_MB,
+)
+from webdriver_pool import WebDriverPool
+
+logger = logging.getLogger(__name__)
+
+# Runs inside the page and resolves once a price is visible (or the timeout
+# passes), so reading a page costs one WebDriver round-trip. Arguments: timeout
+# in ms, JSON price keys, detail price selectors, listing price selector and
+# whether listing prices alone end the wait. On a product page they don't:
+# related-product cards can render before the product's own price.
+BROWSER_STATE_SCRIPT = """
+const [timeoutMs, priceKeys, detailSelectors, listingSelector, listingEnds] = arguments;
+const done = arguments[arguments.length - 1];
+const started = Date.now();
+
+// The product page a listing card links to: from the closest ancestor that
+// links to exactly one product (stop once an ancestor spans several cards)
+function cardLink(element) {
+    const inside = element.closest('a[href*="/detail/"]');
+    if (inside) {
+        return inside.href;
+    }
+    for (let node = element.parentElement; node; node = node.parentElement) {
+        const hrefs = new Set(Array.from(node.querySelectorAll('a[href*="/detail/"]'), link => link.href));
+        if (hrefs.size === 1) {
+            return hrefs.values().next().value;
+        }
+        if (hrefs.size > 1) {
+            return null;
+        }
+    }
+    return null;
+}
+
+function readState() {
+    let nextData = null;
+    if (window.__NEXT_DATA__) {
+        nextData = JSON.stringify(window.__NEXT_DATA__);
+    } else {
+        const script = document.getElementById('__NEXT_DATA__');
+        nextData = script ? script.textContent : null;
+    }
+    let detail = null;
+    for (const selector of detailSelectors) {
+        const element = document.querySelector(selector);
+        if (element && element.textContent.trim()) {
+            detail = element.textContent.trim();
+            break;
+        }
+    }
+    // Each listing price with the product link of its card, if any
+    const listing = Array.from(document.querySelectorAll(listingSelector), element => {
+        return {price: element.textContent.trim(), href: cardLink(element)};
+    });
+    return {next_data: nextData, detail: detail, listing: listing};
+}
+
+(function poll() {
+    const state = readState();
+    const jsonPrice = state.next_data && priceKeys.some(key => state.next_data.includes('"' + key + '"'));
+    const listingPrice = listingEnds && state.listing.length;
+    if (jsonPrice || state.detail || listingPrice || Date.now() - started > timeoutMs) {
+        done(state);
+    } else {
+        setTimeout(poll, 100);
+    }
+})();
+"""
+
+
+def read_browser_state(driver, profile: CompetitorProfile, product_id: Optional[str] = None,
+                       timeout: float = METRO_BROWSER_STATE_TIMEOUT) -> dict:
+    """
+    The page's Next.js state (as JSON text), detail price text and listing
+    price texts, read with a single async script call. For a product page
+    (`product_id` given) the wait only ends early on the JSON or detail
+    price; listing prices are whatever has rendered when it times out.
+    """
+    driver.set_script_timeout(timeout + 5)
+    state = driver.execute_async_script(
+        BROWSER_STATE_SCRIPT, int(timeout * 1000), list(profile.json_price_keys),
+        profile.detail_selectors, METRO_LISTING_PRICE_SELECTOR, product_id is None
+    )
+    return state or {}
+
+
+def price_from_browser_state(state: dict, product_id: Optional[str], profile: CompetitorProfile) -> Optional[str]:
+    """
+    Price from a browser state: the Next.js JSON first, then the detail price
+    text, then the lowest listing price on the page
+    """
+    if state.get('next_data'):
+        try:
+            price = find_product_price(json.loads(state['next_data']), product_id, profile.json_price_keys)
+        except ValueError as e:
+            logger.warning(f"Could not parse Metro browser state: {e}")
+            price = None
+        if price and profile.is_valid_price(price):
+            return price_patterns.format_price(price)
+
+    if state.get('detail'):
+        price = profile.extract_price_from_text(state['detail'])
+        if price:
+            return price_patterns.format_price(price)
+
+    texts = [entry['price'] for entry in state.get('listing') or []]
+    prices = [float(price) for price in map(profile.extract_price_from_text, texts) if price]
+    if prices:
+        return f"{min(prices):.2f}"
+    return None
+
+
+def listing_prices_from_browser_state(state: dict, profile: CompetitorProfile) -> Dict[str, str]:
+    """
+    Prices by Metro product id from a listing page's browser state: every
+    product in the Next.js JSON, plus every rendered price card linking to a
+    product page
+    """
+    prices = {}
+    if state.get('next_data'):
+        try:
+            next_data = json.loads(state['next_data'])
+        except ValueError as e:
+            logger.warning(f"Could not parse Metro browser state: {e}")
+        else:
+            for product_id, price in find_listing_prices(next_data, profile.json_price_keys).items():
+                if profile.is_valid_price(price):
+                    prices[product_id] = price_patterns.format_price(price)
+
+    for entry in state.get('listing') or []:
+        product_id = get_product_id(entry.get('href') or '')
+        if not product_id or product_id in prices:
+            continue
+        price = profile.extract_price_from_text(entry['price'])
+        if price:
+            prices[product_id] = price_patterns.format_price(price)
+    return prices
+
+
+def fetch_product_price(driver_pool: WebDriverPool, profile: CompetitorProfile, url: str) -> Optional[str]:
+    """
+    Load a Metro product page on a pooled driver and read its price with a
+    single browser-state script call. A driver that fails is not reused.
+    """
+    # Borrow a long-lived driver from the pool instead of starting Chrome per URL
+    driver = driver_pool.acquire()
+    broken = False
+    try:
+        driver_pool.load(driver, url)
+        product_id = get_product_id(url)
+        state = read_browser_state(driver, profile, product_id)
+        return price_from_browser_state(state, product_id, profile)
+    except Exception as e:
+        logger.error(f"Selenium Metro error for {url}: {e}")
+        # Driver may have crashed or hung; don't hand it out again
+        broken = True
+        return None
+    finally:
+        driver_pool.release(driver, broken=broken)
+
+
+# Set on a tab's current document right before it is sent to a new URL; the
+# new document doesn't have it, which tells us the navigation has committed
+NAVIGATE_SCRIPT = "window.__metroTabPending = true; window.location.href = arguments[0];"
+LOADED_SCRIPT = "return window.__metroTabPending !== true && document.readyState !== 'loading';"
+
+
+def available_memory_mb() -> Optional[int]:
+    """
+    Memory available to new processes in MB (free plus reclaimable page
+    cache), or None if it can't be determined
+    """
+    try:
+        import psutil
+        return psutil.virtual_memory().available // (1024 * 1024)
+    except ImportError:
+        pass
+    # MemFree alone leaves out the page cache, which is usually most of the RAM
+    try:
+        with open('/proc/meminfo', 'r', encoding='ascii') as file:
+            for line in file:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def tab_count(max_tabs: int = METRO_MAX_TABS, tab_memory_mb: int = METRO_TAB_MEMORY_MB) -> int:
+    """
+    How many tabs to keep open: METRO_MAX_TABS, fewer if free RAM is short
+    """
+    available = available_memory_mb()
+    if available is None:
+        return max(1, max_tabs)
+    return max(1, min(max_tabs, available // tab_memory_mb))
+
+
+class MetroTabBrowser:
+    """
+    Read Metro prices from many pages with several tabs of one pooled Chrome.
+
+    Every tab is sent to a URL up front. Then the oldest tab is read; as soon
+    as it is done it is sent to the next URL, and the next tab - which has
+    been loading meanwhile - is read. Network waits overlap with extraction
+    without paying for more browser processes.
+    """
+
+    def __init__(self, driver_pool: WebDriverPool, profile: CompetitorProfile, tabs: Optional[int] = None):
+        self.driver_pool = driver_pool
+        self.profile = profile
+        self.tabs = tabs
+
+    def _navigate(self, driver, handle: str, url: str, pace: Optional[Callable[[str], None]]) -> float:
+        if pace:
+            pace(url)
+        driver.switch_to.window(handle)
+        driver.execute_script(NAVIGATE_SCRIPT, url)
+        return time.monotonic()
+
+    def _read(self, driver, handle: str, url: str, started: float) -> Optional[str]:
+        driver.switch_to.window(handle)
+        deadline = started + self.driver_pool.page_load_timeout
+        while True:
+            try:
+                if driver.execute_script(LOADED_SCRIPT):
+                    break
+            except Exception:
+                # The old document was unloaded under the script; try again
+                pass
+            if time.monotonic() > deadline:
+                logger.error(f"Timed out loading Metro page in tab: {url}")
+                return None
+            time.sleep(0.05)
+        self.driver_pool.record_timing(url, time.monotonic() - started)
+        product_id = get_product_id(url)
+        state = read_browser_state(driver, self.profile, product_id)
+        return price_from_browser_state(state, product_id, self.profile)
+
+    def _start(self, driver, handle: str, pending: deque, in_flight: deque,
+               on_result: Callable[[str, Optional[str]], None],
+               pace: Optional[Callable[[str], None]]):
+        # Navigate a tab to the next pending URL; a failed navigation is
+        # reported for that URL before the error aborts the batch
+        url = pending.popleft()
+        try:
+            started = self._navigate(driver, handle, url, pace)
+        except Exception:
+            on_result(url, None)
+            raise
+        in_flight.append((handle, url, started))
+
+    def _fetch_batch(self, urls: List[str], on_result: Callable[[str, Optional[str]], None],
+                     pace: Optional[Callable[[str], None]]):
+        driver = self.driver_pool.acquire()
+        broken = False
+        pending = deque(urls)
+        in_flight = deque()
+        try:
+            handles = [driver.current_window_handle]
+            tabs = min(self.tabs or tab_count(), len(urls))
+            while len(handles) < tabs:
+                driver.switch_to.new_window('tab')
+                handles.append(driver.current_window_handle)
+            logger.info(f"Loading {len(urls)} Metro pages in {len(handles)} tab(s)")
+
+            for handle in handles:
+                self._start(driver, handle, pending, in_flight, on_result, pace)
+
+            while in_flight:
+                handle, url, started = in_flight.popleft()
+                try:
+                    price = self._read(driver, handle, url, started)
+                except Exception as e:
+                    logger.error(f"Selenium Metro error for {url}: {e}")
+                    price = None
+                on_result(url, price)
+                # Start this tab on its next page before reading the others
+                if pending:
+                    self._start(driver, handle, pending, in_flight, on_result, pace)
+
+            # Leave the driver with a single tab for the next borrower
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+        except Exception as e:
+            logger.error(f"Metro browser tabs failed: {e}")
+            # Driver may have crashed or hung; don't hand it out again
+            broken = True
+            for _, url, _ in in_flight:
+                on_result(url, None)
+            for url in pending:
+                on_result(url, None)
+        finally:
+            self.driver_pool.release(driver, broken=broken, pages=len(urls))
+
+    def fetch_prices(self, urls: List[str], on_result: Callable[[str, Optional[str]], None],
+                     pace: Optional[Callable[[str], None]] = None):
+        """
+        Load every URL and call `on_result(url, price)` as each page is read.
+        `pace(url)` is called before each navigation (e.g. a rate limiter).
+        Batches are capped at the pool's max_pages so drivers still get recycled.
+        """
+        batch_size = max(1, self.driver_pool.max_pages)
+        for start in range(0, len(urls), batch_size):
+            self._fetch_batch(urls[start:start + batch_size], on_result, pace)
+
+    def fetch_listing(self, url: str) -> Dict[str, str]:
+        """
+        Load a category listing page and return its prices by product id
+        """
+        driver = self.driver_pool.acquire()
+        broken = False
+        try:
+            self.driver_pool.load(driver, url)
+            state = read_browser_state(driver, self.profile)
+            return listing_prices_from_browser_state(state, self.profile)
+        except Exception as e:
+            logger.error(f"Selenium Metro listing error for {url}: {e}")
+            # Driver may have crashed or hung; don't hand it out again
+            broken = True
+            return {}
+        finally:
+            self.driver_pool.release(driver, broken=broken)
@@ -0,0 +1,312 @@
+import json
+import logging
+import re
+import threading
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import requests
+
+from http_cache import HttpCache
+from scraper_config import METRO_LISTING_MIN_SKUS, METRO_LISTING_URL
+
+logger = logging.getLogger(__name__)
+
+NEXT_DATA_RE = re.compile(
+    rb'<script[^>]*\bid=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>',
+    re.DOTALL | re.IGNORECASE
+)
+PRODUCT_ID_RE = re.compile(r'/(\d+)/?(?:[?#]|$)')
+# /detail/<category>/<sub>/.../<product-slug>/<id>
+CATEGORY_PATH_RE = re.compile(r'/detail/((?:[^/?#]+/)+)[^/?#]+/\d+/?(?:[?#]|$)')
+
+# Keys checked in order; the selling price wins over the list price
+PRICE_KEYS = ('sell_price', 'price')
+ID_KEYS = ('id', 'product_id', 'productId')
+
+
+def get_product_id(url: str) -> Optional[str]:
+    """
+    Numeric Metro product id at the end of a /detail/... URL
+    """
+    match = PRODUCT_ID_RE.search(url)
+    return match.group(1) if match else None
+
+
+def get_category_path(url: str) -> Optional[str]:
+    """
+    Category path of a Metro /detail/... URL, e.g. 'grocery/tea-and-coffee/tea'
+    """
+    match = CATEGORY_PATH_RE.search(url)
+    return match.group(1).rstrip('/') if match else None
+
+
+def extract_next_data(html_content: bytes) -> Optional[Any]:
+    """
+    Return the parsed __NEXT_DATA__ JSON embedded in a Next.js page, if any.
+    Works on the raw page bytes; Next.js always serves UTF-8 JSON.
+    """
+    match = NEXT_DATA_RE.search(html_content)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(1))
+    except ValueError as e:
+        logger.warning(f"Could not parse Metro __NEXT_DATA__: {e}")
+        return None
+
+
+def _price_from_dict(node: dict, price_keys: Sequence[str]) -> Optional[str]:
+    for key in price_keys:
+        value = node.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+    return None
+
+
+def find_product_price(next_data: Any, product_id: Optional[str] = None,
+                       price_keys: Sequence[str] = PRICE_KEYS) -> Optional[str]:
+    """
+    Walk the Next.js data breadth-first and return the product's price.
+
+    A product object whose id matches `product_id` wins; otherwise the
+    shallowest object carrying a price is used, which is the page's main
+    product rather than a related-products entry further down the tree.
+    """
+    root = next_data
+    if isinstance(next_data, dict):
+        root = next_data.get('props', {}).get('pageProps', next_data)
+
+    first_price = None
+    queue = deque([root])
+    while queue:
+        node = queue.popleft()
+        if isinstance(node, dict):
+            price = _price_from_dict(node, price_keys)
+            if price is not None:
+                if product_id and any(str(node.get(key)) == product_id for key in ID_KEYS):
+                    return price
+                if first_price is None:
+                    first_price = price
+            queue.extend(node.values())
+        elif isinstance(node, list):
+            queue.extend(node)
+    return first_price
+
+
+def find_listing_prices(next_data: Any, price_keys: Sequence[str] = PRICE_KEYS) -> Dict[str, str]:
+    """
+    Prices by product id for every product object in a listing page's
+    Next.js data. The shallowest object for an id wins.
+    """
+    prices = {}
+    queue = deque([next_data])
+    while queue:
+        node = queue.popleft()
+        if isinstance(node, dict):
+            product_id = next((node[key] for key in ID_KEYS if node.get(key) is not None), None)
+            if product_id is not None and str(product_id) not in prices:
+                price = _price_from_dict(node, price_keys)
+                if price is not None:
+                    prices[str(product_id)] = price
+            queue.extend(node.values())
+        elif isinstance(node, list):
+            queue.extend(node)
+    return prices
+
+
+class MetroTieredFetcher:
+    """
+    Fetch a Metro price with the cheapest method that works.
+
+    Tier 1 is a plain HTTP GET that reads the price from the page's embedded
+    __NEXT_DATA__ JSON. Only when that fails is `browser_fetch` (Selenium)
+    used. `stats` counts how often each tier produced the price.
+
+    `browser_fetch_many(urls, on_result, pace)`, when given, lets
+    `fetch_prices` send all of a batch's JSON-tier misses to the browser at once.
+    `browser_listing(url)` returns a listing page's prices by product id and
+    backs up the JSON read in `harvest_listings`.
+    """
+
+    def __init__(self, session: requests.Session, browser_fetch: Callable[[str], Optional[str]],
+                 is_valid_price: Callable[[str], bool], format_price: Callable[[str], str],
+                 http_cache: Optional[HttpCache] = None, price_keys: Sequence[str] = PRICE_KEYS,
+                 browser_fetch_many: Optional[Callable] = None,
+                 browser_listing: Optional[Callable[[str], Dict[str, str]]] = None):
+        self.session = session
+        self.price_keys = price_keys
+        self.http_cache = http_cache
+        self.browser_fetch = browser_fetch
+        self.browser_fetch_many = browser_fetch_many
+        self.browser_listing = browser_listing
+        self.is_valid_price = is_valid_price
+        self.format_price = format_price
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def _count(self, tier: str):
+        with self.lock:
+            self.stats[tier] += 1
+
+    def fetch_next_data_price(self, url: str) -> Optional[str]:
+        """
+        Tier 1: price from the server-rendered __NEXT_DATA__ JSON
+        """
+        if self.http_cache is not None:
+            response, cached = self.http_cache.get(self.session, url, timeout=30)
+            # 304 Not Modified: the page (and so its JSON price) hasn't changed
+            if cached is not None:
+                return cached['price']
+        else:
+            response = self.session.get(url, timeout=30)
+        if response.status_code >= 400:
+            logger.error(f"HTTP {response.status_code} error for Metro: {url}")
+            return None
+        next_data = extract_next_data(response.content)
+        if next_data is None:
+            return None
+        price = find_product_price(next_data, get_product_id(url), self.price_keys)
+        price = self.format_price(price) if price and self.is_valid_price(price) else None
+        if self.http_cache is not None:
+            self.http_cache.store(url, response, price)
+        return price
+
+    def _try_next_data(self, url: str) -> Optional[str]:
+        try:
+            price = self.fetch_next_data_price(url)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Metro HTTP tier failed for {url}: {e}")
+            price = None
+        if price:
+            self._count('next_data')
+        return price
+
+    def fetch_price(self, url: str) -> Optional[str]:
+        """
+        Try the JSON tier, then the browser tier, and record which one won
+        """
+        price = self._try_next_data(url)
+        if price:
+            return price
+
+        logger.info(f"Metro JSON tier missed, falling back to browser: {url}")
+        price = self.browser_fetch(url)
+        self._count('browser' if price else 'miss')
+        return price
+
+    def fetch_prices(self, urls: Sequence[str], on_result: Callable[[str, Optional[str]], None],
+                     pace: Optional[Callable[[str], None]] = None):
+        """
+        Like `fetch_price` for many URLs, calling `on_result(url, price)` for
+        each. Every URL goes through the JSON tier first; the misses are then
+        loaded by the browser together (`browser_fetch_many`), or one by one
+        when no batch fetcher was given. `pace(url)` is called before each request.
+        """
+        misses = []
+        for url in urls:
+            if pace:
+                pace(url)
+            price = self._try_next_data(url)
+            if price:
+                on_result(url, price)
+            else:
+                misses.append(url)
+        if not misses:
+            return
+
+        logger.info(f"Metro JSON tier missed {len(misses)} of {len(urls)} pages, falling back to browser")
+
+        def browser_result(url: str, price: Optional[str]):
+            self._count('browser' if price else 'miss')
+            on_result(url, price)
+
+        if self.browser_fetch_many is not None:
+            self.browser_fetch_many(misses, browser_result, pace)
+        else:
+            for url in misses:
+                if pace:
+                    pace(url)
+                browser_result(url, self.browser_fetch(url))
+
+    def fetch_listing_prices(self, url: str) -> Dict[str, str]:
+        """
+        Valid prices by product id from a listing page's __NEXT_DATA__ JSON
+        """
+        try:
+            response = self.session.get(url, timeout=30)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Metro listing request failed for {url}: {e}")
+            return {}
+        if response.status_code >= 400:
+            logger.error(f"HTTP {response.status_code} error for Metro listing: {url}")
+            return {}
+        next_data = extract_next_data(response.content)
+        if next_data is None:
+            return {}
+        return {
+            product_id: self.format_price(price)
+            for product_id, price in find_listing_prices(next_data, self.price_keys).items()
+            if self.is_valid_price(price)
+        }
+
+    def harvest_listings(self, urls: Sequence[str], on_result: Callable[[str, Optional[str]], None],
+                         pace: Optional[Callable[[str], None]] = None,
+                         min_skus: int = METRO_LISTING_MIN_SKUS) -> List[str]:
+        """
+        Price many product URLs from their category listing pages. URLs are
+        grouped by category path; every category with at least `min_skus`
+        URLs has its listing (METRO_LISTING_URL) loaded once - JSON first, the
+        browser if products are still missing - and products are matched by
+        their numeric id. Calls `on_result(url, price)` for each URL priced
+        this way and returns the URLs that still need their own page.
+        """
+        groups: Dict[str, List[str]] = {}
+        remaining = []
+        for url in urls:
+            path = get_category_path(url)
+            if path and get_product_id(url):
+                groups.setdefault(path, []).append(url)
+            else:
+                remaining.append(url)
+
+        for path, group in groups.items():
+            if len(group) < min_skus:
+                remaining.extend(group)
+                continue
+            listing = METRO_LISTING_URL.format(path=path)
+            if pace:
+                pace(listing)
+            prices = self.fetch_listing_prices(listing)
+            wanted = {get_product_id(url) for url in group}
+            if self.browser_listing is not None and not wanted <= prices.keys():
+                if pace:
+                    pace(listing)
+                prices = {**self.browser_listing(listing), **prices}
+
+            found = 0
+            for url in group:
+                price = prices.get(get_product_id(url))
+                if price:
+                    found += 1
+                    self._count('listing')
+                    on_result(url, price)
+                else:
+                    remaining.append(url)
+            logger.info(f"Metro listing {path}: priced {found} of {len(group)} products")
+        return remaining
+
+    def log_stats(self):
+        """
+        Log how often each tier produced the price
+        """
+        total = sum(self.stats.values())
+        if not total:
+            return
+        logger.info(
+            f"Metro tiers: listing={self.stats['listing']}, next_data={self.stats['next_data']}, "
+            f"browser={self.stats['browser']}, "
+            f"miss={self.stats['miss']} (of {total})"
+        )
@@ -1,21 +1,25 @@
+import argparse
 import csv
+import functools
 import requests
-from bs4 import BeautifulSoup
-import time
-import re
 from urllib.parse import urlparse
 import logging
 from typing import List, Dict, Optional, Tuple
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-import pymysql
 import traceback
 
+import db
+from competitor_profiles import get_profile
+from fetch_engine import get_host
+from http_cache import HttpCache
+from metro_browser import MetroTabBrowser, fetch_product_price
+from metro_fetcher import MetroTieredFetcher
+from parser_backend import get_parser_backend
+from rate_limiter import DomainRateLimiter
+from rescrape_scheduler import RescrapeScheduler
+from scrape_journal import ScrapeJournal
+from webdriver_pool import WebDriverPool
+from price_store import create_schema, save_prices
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -31,182 +35,45 @@ class MetroPriceScraper:
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
+        # Product pages are revalidated against an on-disk cache between runs
+        self.http_cache = HttpCache('metro')
         self.competitor_name = 'Metro'
+        # Metro's selectors, JSON keys and price pattern, compiled once
+        self.profile = get_profile(self.competitor_name)
+        self.rate_limiter = DomainRateLimiter()
+        # Chrome drivers are started on first use and reused across URLs
+        self.driver_pool = WebDriverPool()
+        # Browser-fallback pages are loaded several at a time in tabs of one driver
+        self.tab_browser = MetroTabBrowser(self.driver_pool, self.profile)
+        self.metro_fetcher = MetroTieredFetcher(self.session,
+                                                functools.partial(fetch_product_price, self.driver_pool, self.profile),
+                                                self.is_valid_price, self.format_price, self.http_cache,
+                                                self.profile.json_price_keys, self.tab_browser.fetch_prices,
+                                                self.tab_browser.fetch_listing)
+        # BeautifulSoup tree builder (PARSER_BACKEND, falling back to html.parser)
+        self.parser_backend = get_parser_backend()
         self.results = []
+        # (SKU, competitor) pairs whose last price was reused without scraping
+        self.reused_prices = set()
         
     def extract_price_from_html(self, html_content: str) -> Optional[str]:
         """
         Extract price from HTML content for Metro
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # First, try to extract price from JSON data in script tags (Metro stores prices here)
-        scripts = soup.find_all('script')
-        for script in scripts:
-            script_text = script.get_text()
-            if script_text:
-                # Look for JSON data containing price information
-                if '"price"' in script_text and '"sell_price"' in script_text:
-                    logger.info(f"Debug: Found Metro JSON data with prices")
-                    # Extract price from JSON
-                    price_match = re.search(r'"price":(\d+(?:\.\d+)?)', script_text)
-                    sell_price_match = re.search(r'"sell_price":(\d+(?:\.\d+)?)', script_text)
-                    
-                    if sell_price_match:
-                        price = sell_price_match.group(1)
-                        logger.info(f"Debug: Found Metro sell_price: {price}")
-                        if self.is_valid_price(price):
-                            return self.format_price(price)
-                    
-                    if price_match:
-                        price = price_match.group(1)
-                        logger.info(f"Debug: Found Metro price: {price}")
-                        if self.is_valid_price(price):
-                            return self.format_price(price)
-        
-        # Use the specific Metro price selector path
-        price_selector = "#__next > div > div.main-container > div > div.CategoryGrid_product_details_container_without_imageCarousel__xOYB6 > div.CategoryGrid_product_details_description_container__OjSn3 > p.CategoryGrid_product_details_price__dNQQQ"
-        price_tag = soup.select_one(price_selector)
-        
-        if price_tag:
-            price_text = price_tag.get_text(strip=True)
-            logger.info(f"Debug: Found Metro price using specific selector: '{price_text}'")
-            price = self.extract_price_from_text(price_text)
-            if price and self.is_valid_price(price):
-                logger.info(f"Debug: Found Metro price: {price}")
-                return self.format_price(price)
-        
-        # Also try the shorter class name as fallback
-        price_tag = soup.find("p", class_="CategoryGrid_product_details_price__dNQQQ")
-        if price_tag:
-            price_text = price_tag.get_text(strip=True)
-            logger.info(f"Debug: Found Metro price using class selector: '{price_text}'")
-            price = self.extract_price_from_text(price_text)
-            if price and self.is_valid_price(price):
-                logger.info(f"Debug: Found Metro price: {price}")
-                return self.format_price(price)
-        
-        # Fallback to other Metro selectors
-        metro_price_selectors = [
-            '.product-price', '.price-display', '.price-value',
-            '.product-price-value', '.price-amount', '.product-amount',
-            '.selling-price', '.offer-price', '.discount-price', '.final-price',
-            '.price-box', '.price-container', '.product-price-box',
-            '.price-wrapper', '.price-section', '.product-price-section',
-            '.product-details-price', '.current-price', '.regular-price',
-            '.product-price-display', '.price-text', '.price-label',
-            '.price', '.amount', '.product-price',
-            '[class*="price"]', '[class*="Price"]', '[class*="amount"]',
-            '[class*="Amount"]', '[class*="cost"]', '[class*="Cost"]',
-            '[data-price]', '[data-amount]', '[data-value]',
-            '.cost', '.value', '.product-cost', '.product-value',
-            '.product-details', '.product-info', '.product-summary',
-            '.product-description', '.product-content'
-        ]
-        
-        # Try to find price in specific Metro elements
-        for selector in metro_price_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                text = element.get_text(strip=True)
-                # Skip very short or very long text
-                if len(text) < 3 or len(text) > 100:
-                    continue
-                
-                # Check for data attributes first
-                if element.has_attr('data-price'):
-                    price = str(element['data-price'])
-                    if self.is_valid_price(price):
-                        logger.info(f"Debug: Found Metro price in data-price: {price}")
-                        return self.format_price(price)
-                
-                if element.has_attr('data-amount'):
-                    price = str(element['data-amount'])
-                    if self.is_valid_price(price):
-                        logger.info(f"Debug: Found Metro price in data-amount: {price}")
-                        return self.format_price(price)
-                
-                logger.info(f"Debug: Metro selector '{selector}' found text: '{text}'")
-                price = self.extract_price_from_text(text)
-                if price and self.is_valid_price(price):
-                    logger.info(f"Debug: Found Metro price in selector '{selector}': {price}")
-                    return price
-        
-        # If no price found in specific selectors, try broader search
-        logger.info("Debug: No price found in specific selectors, trying broader search")
-        
-        # Focus on main content area
-        main_content_selectors = [
-            'main', '.main-content', '.content', '.product-content',
-            '.product-details', '.product-info', '.product-summary'
-        ]
-        
-        for main_selector in main_content_selectors:
-            main_content = soup.select_one(main_selector)
-            if main_content:
-                text = main_content.get_text()
-                price = self.extract_price_from_text(text)
-                if price and self.is_valid_price(price):
-                    logger.info(f"Debug: Found Metro price in main content: {price}")
-                    return self.format_price(price)
-        
-        # Final fallback: search entire page
-        text = soup.get_text()
-        price = self.extract_price_from_text(text)
-        if price and self.is_valid_price(price):
-            logger.info(f"Debug: Found Metro price in entire page: {price}")
-            return self.format_price(price)
-        
-        return None
+        price, _ = self.profile.extract_price(html_content, self.parser_backend)
+        return price
 
     def extract_price_from_text(self, text: str) -> Optional[str]:
         """
-        Extract price from text using regex patterns
+        Extract price from text with the competitor's precompiled price pattern
         """
-        # Remove extra whitespace and normalize
-        text = re.sub(r'\s+', ' ', text.strip())
-        
-        # Price patterns to try
-        patterns = [
-            r'Rs\.?\s*([\d,]+(?:\.\d{2})?)',
-            r'PKR\s*([\d,]+(?:\.\d{2})?)',
-            r'Price:\s*Rs\.?\s*([\d,]+(?:\.\d{2})?)',
-            r'([\d,]+(?:\.\d{2})?)\s*Rs',
-            r'([\d,]+(?:\.\d{2})?)\s*PKR',
-            r'Rs\s*([\d,]+(?:\.\d{2})?)',
-            r'PKR\s*([\d,]+(?:\.\d{2})?)',
-            r'([\d,]+(?:\.\d{2})?)',
-            r'Price\s*:?\s*([\d,]+(?:\.\d{2})?)',
-            r'[\d,]+(?:\.\d{2})?\s*PKR',
-            r'PKR\s*([\d,]+(?:\.\d{2})?)'
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                if isinstance(match, tuple):
-                    match = match[0]
-                price = match.replace(',', '')
-                if self.is_valid_price(price):
-                    return price
-        
-        return None
+        return self.profile.extract_price_from_text(text)
 
     def is_valid_price(self, price_str: str) -> bool:
         """
-        Validate if a string represents a valid price
+        Validate if a string represents a valid price (within the profile's price_range)
         """
-        try:
-            # Remove commas and convert to float
-            price = float(price_str.replace(',', ''))
-            # Check if price is reasonable (between 1 and 100000)
-            return 1 <= price <= 100000
-        except (ValueError, TypeError):
-            return False
+        return self.profile.is_valid_price(price_str)
 
     def format_price(self, price_str: str) -> str:
         """
@@ -220,63 +87,36 @@ class MetroPriceScraper:
 
     def scrape_price(self, url: str) -> Optional[str]:
         """
-        Scrape price from Metro URL using Selenium
+        Scrape price from Metro URL (embedded JSON first, Selenium as fallback)
         """
         try:
             logger.info(f"Scraping price from Metro: {url}")
             
-            # Use Selenium for Metro (special handling)
-            return self.get_metro_price_selenium(url)
+            return self.metro_fetcher.fetch_price(url)
                 
         except Exception as e:
             logger.error(f"Error scraping Metro: {e}")
             return None
 
-    def get_metro_price_selenium(self, url):
+    def pace(self, url: str):
         """
-        Get Metro price using Selenium (special handling for Metro)
+        Wait for Metro's token bucket before a request (instead of a fixed sleep)
         """
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--window-size=1920,1080')
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        try:
-            driver.get(url)
-            wait = WebDriverWait(driver, 20)
-            # Try the specific product detail price selector first
-            try:
-                price_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'p.CategoryGrid_product_details_price__dNQQQ')))
-                price_text = price_elem.text.strip()
-                price = self.extract_price_from_text(price_text)
-                if price and self.is_valid_price(price):
-                    return self.format_price(price)
-            except Exception:
-                # Fallback: try all p.CategoryGrid_product_price__Svf8T elements and pick the lowest
-                price_elements = driver.find_elements(By.CSS_SELECTOR, 'p.CategoryGrid_product_price__Svf8T')
-                prices = []
-                for elem in price_elements:
-                    text = elem.text.strip()
-                    price = self.extract_price_from_text(text)
-                    if price and self.is_valid_price(price):
-                        prices.append(float(price))
-                if prices:
-                    min_price = min(prices)
-                    return f"{min_price:.2f}"
-            return None
-        except Exception as e:
-            logger.error(f"Selenium Metro error: {e}")
-            return None
-        finally:
-            driver.quit()
+        self.rate_limiter.acquire(get_host(url))
 
-    def process_csv(self, csv_file_path: str):
+    def process_csv(self, csv_file_path: str, resume: bool = False, full_refresh: bool = False,
+                    listings: bool = False):
         """
-        Process CSV file and extract Metro data
+        Process CSV file and extract Metro data.
+        Every price is journaled as soon as it is scraped; with `resume=True`
+        SKUs already in the journal from an interrupted run are skipped.
+        Prices that are unlikely to have changed since the last run are reused
+        unless `full_refresh=True`. With `listings=True` products are first
+        priced from their category listing pages, a page load per category.
         """
         logger.info("Starting to process CSV file for Metro...")
+        journal = ScrapeJournal('metro', resume=resume)
+        schedule = RescrapeScheduler('metro', full_refresh=full_refresh)
         try:
             with open(csv_file_path, 'r', encoding='utf-8') as file:
                 reader = csv.reader(file)
@@ -288,7 +128,11 @@ class MetroPriceScraper:
                 
                 # Initialize results structure
                 self.results = []
+                self.reused_prices = set()
                 
+                # Links to scrape this run, with the rows waiting on each
+                jobs: Dict[str, List[Tuple[dict, str, str]]] = {}
+
                 # Process each product row
                 for row_idx, row in enumerate(rows[2:], start=3):
                     if len(row) < 6:
@@ -308,23 +152,40 @@ class MetroPriceScraper:
                     }
                     
                     # Scrape Metro price if link exists
-                    if metro_link and metro_link.strip() != '':
-                        if row_idx > 3:
-                            time.sleep(5)
-                        logger.info(f"Processing SKU: {sku} for Metro")
-                        price = self.scrape_price(metro_link.strip())
+                    if journal.is_done(sku, 'Metro'):
+                        product_data['Metro_price'] = journal.get_price(sku, 'Metro') or "None"
+                        logger.info(f"⏭️ Metro - {sku}: Already scraped (resumed from journal)")
+                    elif metro_link and not schedule.is_due(sku, 'Metro', metro_link.strip()):
+                        product_data['Metro_price'] = schedule.last_price(sku, 'Metro') or "None"
+                        self.reused_prices.add((sku.strip(), 'Metro'))
+                        logger.info(f"⏭️ Metro - {sku}: Price still fresh, reusing {product_data['Metro_price']}")
+                    elif metro_link and metro_link.strip() != '':
+                        jobs.setdefault(metro_link.strip(), []).append((product_data, sku, metro_link))
+                    else:
+                        product_data['Metro_price'] = "None"
+                        logger.info(f"⏭️ Metro - {sku}: No link provided (set to None)")
+                    
+                    self.results.append(product_data)
+
+                def on_result(url: str, price: Optional[str]):
+                    for product_data, sku, metro_link in jobs[url]:
+                        journal.record(sku, 'Metro', price, metro_link)
+                        schedule.record(sku, 'Metro', price, url)
                         if price:
                             product_data['Metro_price'] = price
                             logger.info(f"✅ Metro - {sku}: {price}")
                         else:
                             product_data['Metro_price'] = "None"
                             logger.warning(f"❌ Metro - {sku}: No price found (set to None)")
-                    else:
-                        product_data['Metro_price'] = "None"
-                        logger.info(f"⏭️ Metro - {sku}: No link provided (set to None)")
-                    
-                    self.results.append(product_data)
+
+                logger.info(f"Scraping {len(jobs)} Metro links")
+                urls = list(jobs)
+                if listings:
+                    urls = self.metro_fetcher.harvest_listings(urls, on_result, self.pace)
+                self.metro_fetcher.fetch_prices(urls, on_result, self.pace)
                 
+                self.metro_fetcher.log_stats()
+                self.http_cache.save()
                 logger.info(f"✅ Completed processing Metro data!")
                 logger.info(f"Total products processed: {len(self.results)}")
                 
@@ -333,112 +194,41 @@ class MetroPriceScraper:
         except Exception as e:
             logger.error(f"Error processing CSV file: {str(e)}")
             traceback.print_exc()
+        finally:
+            journal.close()
+            schedule.save()
 
     def create_mysql_table(self):
         """
-        Create MySQL table with the unified structure (if not exists)
+        Create the MySQL price tables and the unified view (if not exists)
         """
         try:
             logger.info("Creating MySQL table...")
             
-            # Connect to MySQL
-            conn = pymysql.connect(
-                host="localhost",
-                user="root",
-                password="",
-                port=3306
-            )
-            
-            cursor = conn.cursor()
-            
             # Create database if not exists
-            cursor.execute("CREATE DATABASE IF NOT EXISTS competitor_price_data")
-            cursor.execute("USE competitor_price_data")
-            
-            # Create table with all competitor columns
-            create_table_query = """
-                CREATE TABLE IF NOT EXISTS unified_competitor_prices (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    SKU VARCHAR(255),
-                    my_price VARCHAR(50),
-                    Diamond_price VARCHAR(50),
-                    Diamond_link TEXT,
-                    Naheed_price VARCHAR(50),
-                    Naheed_link TEXT,
-                    Metro_price VARCHAR(50),
-                    Metro_link TEXT
-                )
-            """
+            db.get_pool().create_database()
             
-            cursor.execute(create_table_query)
+            with db.connection() as conn:
+                # Normalized price tables (migrating the old wide table once) and the unified view
+                create_schema(conn)
             logger.info("✅ MySQL table created successfully!")
             
-            cursor.close()
-            conn.close()
-            
         except Exception as e:
             logger.error(f"Error creating MySQL table: {e}")
             traceback.print_exc()
 
     def save_to_mysql(self):
         """
-        Save Metro results to MySQL (insert new rows)
+        Save Metro results to MySQL (current prices, plus history rows for changed ones)
         """
         try:
             logger.info("Saving Metro data to MySQL...")
             
-            # Connect to MySQL
-            conn = pymysql.connect(
-                host="localhost",
-                user="root",
-                password="",
-                port=3306,
-                database="competitor_price_data"
-            )
-            
-            cursor = conn.cursor()
-            
-            # Insert data for each product
-            for product in self.results:
-                # Check if product already exists
-                check_query = "SELECT id FROM unified_competitor_prices WHERE SKU = %s"
-                cursor.execute(check_query, (product['SKU'],))
-                existing = cursor.fetchone()
-                
-                if existing:
-                    # Update existing row with Metro data
-                    update_query = """
-                        UPDATE unified_competitor_prices 
-                        SET Metro_price = %s, Metro_link = %s
-                        WHERE SKU = %s
-                    """
-                    cursor.execute(update_query, (
-                        product['Metro_price'],
-                        product['Metro_link'],
-                        product['SKU']
-                    ))
-                    logger.info(f"Updated Metro data for SKU: {product['SKU']}")
-                else:
-                    # Insert new row with Metro data
-                    insert_query = """
-                        INSERT INTO unified_competitor_prices 
-                        (SKU, my_price, Metro_price, Metro_link)
-                        VALUES (%s, %s, %s, %s)
-                    """
-                    cursor.execute(insert_query, (
-                        product['SKU'],
-                        product['my_price'],
-                        product['Metro_price'],
-                        product['Metro_link']
-                    ))
-                    logger.info(f"Inserted new row for SKU: {product['SKU']}")
-            
-            conn.commit()
+            with db.connection() as conn:
+                # Batched writes of this run's Metro prices; other competitors' rows are untouched
+                save_prices(conn, self.results, ['Metro'], reused=self.reused_prices)
             logger.info(f"✅ Saved {len(self.results)} Metro products to MySQL!")
             
-            cursor.close()
-            conn.close()
-            
         except Exception as e:
             logger.error(f"Error saving to MySQL: {e}")
             traceback.print_exc()
@@ -466,6 +256,15 @@ def main():
     """
     Main function to run the Metro price scraping process
     """
+    parser = argparse.ArgumentParser(description="Metro Competitor Price Scraper")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip SKUs already scraped by an interrupted run")
+    parser.add_argument('--full-refresh', action='store_true',
+                        help="re-scrape every link, even prices that are still fresh")
+    parser.add_argument('--listings', action='store_true',
+                        help="price products from their category listing pages first")
+    args = parser.parse_args()
+    
     print("Metro Competitor Price Scraper")
     print("="*50)
     print("📋 Processing: Metro competitor only")
@@ -478,7 +277,8 @@ def main():
     
     # Process the CSV file
     csv_file = "Cartpk competitors link(Developer Sample File).csv"
-    scraper.process_csv(csv_file)
+    scraper.process_csv(csv_file, resume=args.resume, full_refresh=args.full_refresh, listings=args.listings)
+    scraper.driver_pool.close()
     
     # Only proceed if we have results
     if scraper.results:
@@ -1,13 +1,24 @@
+import argparse
 import csv
 import requests
-from bs4 import BeautifulSoup
-import time
-import re
 from urllib.parse import urlparse
 import logging
 from typing import List, Dict, Optional, Tuple
-import pymysql
 import traceback
+from requests.adapters import HTTPAdapter
+
+import db
+from competitor_profiles import get_profile
+from fetch_engine import AsyncFetchEngine
+from http_cache import HttpCache
+from page_scraper import scrape_page_price
+from parse_pool import ParsePool, extractor_factory
+from parser_backend import get_parser_backend
+from rescrape_scheduler import RescrapeScheduler
+from scrape_journal import ScrapeJournal
+from scraper_config import FETCH_WORKERS
+from selector_stats import SelectorStats
+from price_store import create_schema, save_prices
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -24,83 +35,53 @@ class NaheedPriceScraper:
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
+        # Keep enough pooled connections for the concurrent fetch engine
+        adapter = HTTPAdapter(pool_connections=FETCH_WORKERS, pool_maxsize=FETCH_WORKERS)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Product pages are revalidated against an on-disk cache between runs
+        self.http_cache = HttpCache('naheed')
+        # Parse worker processes, started by process_csv
+        self.parse_pool = None
         self.competitor_name = 'Naheed'
+        # Naheed's selectors and price pattern, compiled once
+        self.profile = get_profile(self.competitor_name)
+        # BeautifulSoup tree builder (PARSER_BACKEND, falling back to html.parser)
+        self.parser_backend = get_parser_backend()
+        # Selectors that won most often in earlier runs are tried first
+        self.selector_stats = SelectorStats('naheed')
         self.results = []
+        # (SKU, competitor) pairs whose last price was reused without scraping
+        self.reused_prices = set()
         
     def extract_price_from_html(self, html_content: str) -> Optional[str]:
         """
         Extract price from HTML content for Naheed
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Naheed-specific selectors
-        naheed_selectors = [
-            '.price', '.product-price', '.amount', '[class*="price"]',
-            '[class*="Price"]', '.current-price', '.regular-price',
-            '.product-details-price', '.price-box', '.price-wrapper'
-        ]
-        
-        # Try Naheed-specific selectors first
-        for selector in naheed_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                text = element.get_text(strip=True)
-                price = self.extract_price_from_text(text)
-                if price and self.is_valid_price(price):
-                    return self.format_price(price)
-        
-        # Fallback: search entire text for price patterns
-        text = soup.get_text()
-        return self.extract_price_from_text(text)
+        price, _ = self.extract_price_with_selector(html_content)
+        return price
+
+    def extract_price_with_selector(self, html_content, partial: bool = False,
+                                    encoding: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Extract price from HTML content (raw bytes in `encoding`, or text) for
+        Naheed, together with the selector that produced it. `partial` is set
+        for the start of a page still downloading.
+        """
+        return self.profile.extract_price(html_content, self.parser_backend, self.selector_stats,
+                                          partial, encoding)
 
     def extract_price_from_text(self, text: str) -> Optional[str]:
         """
-        Extract price from text using regex patterns
+        Extract price from text with the competitor's precompiled price pattern
         """
-        # Remove extra whitespace and normalize
-        text = re.sub(r'\s+', ' ', text.strip())
-        
-        # Price patterns to try
-        patterns = [
-            r'Rs\.?\s*([\d,]+(?:\.\d{2})?)',
-            r'PKR\s*([\d,]+(?:\.\d{2})?)',
-            r'Price:\s*Rs\.?\s*([\d,]+(?:\.\d{2})?)',
-            r'([\d,]+(?:\.\d{2})?)\s*Rs',
-            r'([\d,]+(?:\.\d{2})?)\s*PKR',
-            r'Rs\s*([\d,]+(?:\.\d{2})?)',
-            r'PKR\s*([\d,]+(?:\.\d{2})?)',
-            r'([\d,]+(?:\.\d{2})?)',
-            r'Price\s*:?\s*([\d,]+(?:\.\d{2})?)',
-            r'[\d,]+(?:\.\d{2})?\s*PKR',
-            r'PKR\s*([\d,]+(?:\.\d{2})?)'
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                if isinstance(match, tuple):
-                    match = match[0]
-                price = match.replace(',', '')
-                if self.is_valid_price(price):
-                    return price
-        
-        return None
+        return self.profile.extract_price_from_text(text)
 
     def is_valid_price(self, price_str: str) -> bool:
         """
-        Validate if a string represents a valid price
+        Validate if a string represents a valid price (within the profile's price_range)
         """
-        try:
-            # Remove commas and convert to float
-            price = float(price_str.replace(',', ''))
-            # Check if price is reasonable (between 1 and 100000)
-            return 1 <= price <= 100000
-        except (ValueError, TypeError):
-            return False
+        return self.profile.is_valid_price(price_str)
 
     def format_price(self, price_str: str) -> str:
         """
@@ -112,42 +93,34 @@ class NaheedPriceScraper:
         except (ValueError, TypeError):
             return price_str
 
+    def parse_page(self, body: bytes, charset: Optional[str], partial: bool = False) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Extract (price, selector) from raw page bytes, on the parse worker
+        processes when they are running
+        """
+        if self.parse_pool is not None:
+            return self.parse_pool.parse(body, charset, self.competitor_name, partial)
+        return self.extract_price_with_selector(body, partial, encoding=charset)
+
     def scrape_price(self, url: str) -> Optional[str]:
         """
         Scrape price from Naheed URL
         """
-        try:
-            logger.info(f"Scraping price from Naheed: {url}")
-            
-            response = self.session.get(url, timeout=30)
-            
-            # Check for HTTP errors (404, 500, etc.)
-            if response.status_code >= 400:
-                logger.error(f"HTTP {response.status_code} error for Naheed: {url}")
-                return None
-            
-            # Extract price from HTML
-            price = self.extract_price_from_html(response.text)
-            
-            if price:
-                logger.info(f"Found price for Naheed: {price}")
-                return price
-            else:
-                logger.warning(f"No price found for Naheed: {url}")
-                return None
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request error for Naheed: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"Error scraping Naheed: {e}")
-            return None
+        return scrape_page_price(self.session, self.http_cache, url, self.competitor_name,
+                                 self.profile.stream_scanner(), self.parse_page, self.selector_stats)
 
-    def process_csv(self, csv_file_path: str):
+    def process_csv(self, csv_file_path: str, resume: bool = False, full_refresh: bool = False):
         """
-        Process CSV file and extract Naheed data
+        Process CSV file and extract Naheed data.
+        Every price is journaled as soon as it is scraped; with `resume=True`
+        SKUs already in the journal from an interrupted run are skipped.
+        Prices that are unlikely to have changed since the last run are reused
+        unless `full_refresh=True`.
         """
         logger.info("Starting to process CSV file for Naheed...")
+        journal = ScrapeJournal('naheed', resume=resume)
+        schedule = RescrapeScheduler('naheed', full_refresh=full_refresh)
+        self.parse_pool = ParsePool(extractor_factory(self.parser_backend, 'naheed'))
         try:
             with open(csv_file_path, 'r', encoding='utf-8') as file:
                 reader = csv.reader(file)
@@ -159,8 +132,10 @@ class NaheedPriceScraper:
                 
                 # Initialize results structure
                 self.results = []
+                self.reused_prices = set()
                 
-                # Process each product row
+                # Build one entry per product row and queue the ones with a Naheed link
+                jobs = []
                 for row_idx, row in enumerate(rows[2:], start=3):
                     if len(row) < 6:
                         continue
@@ -178,24 +153,38 @@ class NaheedPriceScraper:
                         'Naheed_link': naheed_link
                     }
                     
-                    # Scrape Naheed price if link exists
-                    if naheed_link and naheed_link.strip() != '':
-                        if row_idx > 3:
-                            time.sleep(5)
-                        logger.info(f"Processing SKU: {sku} for Naheed")
-                        price = self.scrape_price(naheed_link.strip())
-                        if price:
-                            product_data['Naheed_price'] = price
-                            logger.info(f"✅ Naheed - {sku}: {price}")
-                        else:
-                            product_data['Naheed_price'] = "None"
-                            logger.warning(f"❌ Naheed - {sku}: No price found (set to None)")
+                    if journal.is_done(sku, 'Naheed'):
+                        product_data['Naheed_price'] = journal.get_price(sku, 'Naheed') or "None"
+                        logger.info(f"⏭️ Naheed - {sku}: Already scraped (resumed from journal)")
+                    elif naheed_link and not schedule.is_due(sku, 'Naheed', naheed_link.strip()):
+                        product_data['Naheed_price'] = schedule.last_price(sku, 'Naheed') or "None"
+                        self.reused_prices.add((sku.strip(), 'Naheed'))
+                        logger.info(f"⏭️ Naheed - {sku}: Price still fresh, reusing {product_data['Naheed_price']}")
+                    elif naheed_link and naheed_link.strip() != '':
+                        jobs.append((len(self.results), naheed_link.strip()))
                     else:
                         product_data['Naheed_price'] = "None"
                         logger.info(f"⏭️ Naheed - {sku}: No link provided (set to None)")
                     
                     self.results.append(product_data)
                 
+                def on_result(product_idx, price):
+                    product_data = self.results[product_idx]
+                    sku = product_data['SKU']
+                    journal.record(sku, 'Naheed', price, product_data['Naheed_link'])
+                    schedule.record(sku, 'Naheed', price, product_data['Naheed_link'].strip())
+                    if price:
+                        product_data['Naheed_price'] = price
+                        logger.info(f"✅ Naheed - {sku}: {price}")
+                    else:
+                        product_data['Naheed_price'] = "None"
+                        logger.warning(f"❌ Naheed - {sku}: No price found (set to None)")
+                
+                # Scrape Naheed prices concurrently, bounded per host by HOST_CONCURRENCY
+                AsyncFetchEngine(lambda job_key, url: self.scrape_price(url)).run(jobs, on_result=on_result)
+                
+                self.http_cache.save()
+                self.selector_stats.log_report(self.competitor_name, self.profile.all_selectors)
                 logger.info(f"✅ Completed processing Naheed data!")
                 logger.info(f"Total products processed: {len(self.results)}")
                 
@@ -204,112 +193,44 @@ class NaheedPriceScraper:
         except Exception as e:
             logger.error(f"Error processing CSV file: {str(e)}")
             traceback.print_exc()
+        finally:
+            journal.close()
+            schedule.save()
+            self.selector_stats.save()
+            self.parse_pool.close()
+            self.parse_pool = None
 
     def create_mysql_table(self):
         """
-        Create MySQL table with the unified structure (if not exists)
+        Create the MySQL price tables and the unified view (if not exists)
         """
         try:
             logger.info("Creating MySQL table...")
             
-            # Connect to MySQL
-            conn = pymysql.connect(
-                host="localhost",
-                user="root",
-                password="",
-                port=3306
-            )
-            
-            cursor = conn.cursor()
-            
             # Create database if not exists
-            cursor.execute("CREATE DATABASE IF NOT EXISTS competitor_price_data")
-            cursor.execute("USE competitor_price_data")
-            
-            # Create table with all competitor columns
-            create_table_query = """
-                CREATE TABLE IF NOT EXISTS unified_competitor_prices (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    SKU VARCHAR(255),
-                    my_price VARCHAR(50),
-                    Diamond_price VARCHAR(50),
-                    Diamond_link TEXT,
-                    Naheed_price VARCHAR(50),
-                    Naheed_link TEXT,
-                    Metro_price VARCHAR(50),
-                    Metro_link TEXT
-                )
-            """
+            db.get_pool().create_database()
             
-            cursor.execute(create_table_query)
+            with db.connection() as conn:
+                # Normalized price tables (migrating the old wide table once) and the unified view
+                create_schema(conn)
             logger.info("✅ MySQL table created successfully!")
             
-            cursor.close()
-            conn.close()
-            
         except Exception as e:
             logger.error(f"Error creating MySQL table: {e}")
             traceback.print_exc()
 
     def save_to_mysql(self):
         """
-        Save Naheed results to MySQL (insert new rows)
+        Save Naheed results to MySQL (current prices, plus history rows for changed ones)
         """
         try:
             logger.info("Saving Naheed data to MySQL...")
             
-            # Connect to MySQL
-            conn = pymysql.connect(
-                host="localhost",
-                user="root",
-                password="",
-                port=3306,
-                database="competitor_price_data"
-            )
-            
-            cursor = conn.cursor()
-            
-            # Insert data for each product
-            for product in self.results:
-                # Check if product already exists
-                check_query = "SELECT id FROM unified_competitor_prices WHERE SKU = %s"
-                cursor.execute(check_query, (product['SKU'],))
-                existing = cursor.fetchone()
-                
-                if existing:
-                    # Update existing row with Naheed data
-                    update_query = """
-                        UPDATE unified_competitor_prices 
-                        SET Naheed_price = %s, Naheed_link = %s
-                        WHERE SKU = %s
-                    """
-                    cursor.execute(update_query, (
-                        product['Naheed_price'],
-                        product['Naheed_link'],
-                        product['SKU']
-                    ))
-                    logger.info(f"Updated Naheed data for SKU: {product['SKU']}")
-                else:
-                    # Insert new row with Naheed data
-                    insert_query = """
-                        INSERT INTO unified_competitor_prices 
-                        (SKU, my_price, Naheed_price, Naheed_link)
-                        VALUES (%s, %s, %s, %s)
-                    """
-                    cursor.execute(insert_query, (
-                        product['SKU'],
-                        product['my_price'],
-                        product['Naheed_price'],
-                        product['Naheed_link']
-                    ))
-                    logger.info(f"Inserted new row for SKU: {product['SKU']}")
-            
-            conn.commit()
+            with db.connection() as conn:
+                # Batched writes of this run's Naheed prices; other competitors' rows are untouched
+                save_prices(conn, self.results, ['Naheed'], reused=self.reused_prices)
             logger.info(f"✅ Saved {len(self.results)} Naheed products to MySQL!")
             
-            cursor.close()
-            conn.close()
-            
         except Exception as e:
             logger.error(f"Error saving to MySQL: {e}")
             traceback.print_exc()
@@ -337,6 +258,13 @@ def main():
     """
     Main function to run the Naheed price scraping process
     """
+    parser = argparse.ArgumentParser(description="Naheed Competitor Price Scraper")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip SKUs already scraped by an interrupted run")
+    parser.add_argument('--full-refresh', action='store_true',
+                        help="re-scrape every link, even prices that are still fresh")
+    args = parser.parse_args()
+    
     print("Naheed Competitor Price Scraper")
     print("="*50)
     print("📋 Processing: Naheed competitor only")
@@ -349,7 +277,7 @@ def main():
     
     # Process the CSV file
     csv_file = "Cartpk competitors link(Developer Sample File).csv"
-    scraper.process_csv(csv_file)
+    scraper.process_csv(csv_file, resume=args.resume, full_refresh=args.full_refresh)
     
     # Only proceed if we have results
     if scraper.results:
@@ -0,0 +1,67 @@
+import logging
+from typing import Callable, Optional, Tuple
+
+import requests
+
+from http_cache import HttpCache
+from selector_stats import SelectorStats
+from stream_fetch import StreamScanner, read_price
+
+logger = logging.getLogger(__name__)
+
+
+def scrape_page_price(session: requests.Session, http_cache: HttpCache, url: str, competitor_name: str,
+                      scanner: StreamScanner,
+                      parse: Callable[[bytes, Optional[str], bool], Tuple[Optional[str], Optional[str]]],
+                      selector_stats: Optional[SelectorStats] = None) -> Optional[str]:
+    """
+    Scrape the price from a product page over plain HTTP, shared by every
+    requests-based scraper.
+
+    The page is revalidated against `http_cache` (a 304 reuses the price
+    extracted last time), otherwise streamed until `scanner` says the price
+    should have arrived. `parse(body, charset, partial)` extracts a
+    (price, selector) pair from raw bytes, on the parse worker processes when
+    the scraper runs them. The winning selector is recorded in `selector_stats`.
+    """
+    try:
+        logger.info(f"Scraping price from {competitor_name}: {url}")
+
+        response, cached = http_cache.get(session, url, timeout=30, stream=True)
+
+        # 304 Not Modified: reuse the price extracted last time
+        if cached is not None:
+            response.close()
+            price = cached['price']
+            if price is None:
+                body = http_cache.read_body(cached)
+                if body:
+                    price, _ = parse(body, cached.get('encoding'), False)
+            logger.info(f"Not modified, reusing cached price for {competitor_name}: {price}")
+            return price
+
+        # Check for HTTP errors (404, 500, etc.)
+        if response.status_code >= 400:
+            response.close()
+            logger.error(f"HTTP {response.status_code} error for {competitor_name}: {url}")
+            return None
+
+        # Stream the page and stop downloading as soon as the price is found
+        price, selector, body, charset = read_price(response, scanner, parse)
+        if selector_stats is not None:
+            selector_stats.record(competitor_name, selector)
+
+        http_cache.store(url, response, price, body, charset)
+
+        if price:
+            logger.info(f"Found price for {competitor_name}: {price}")
+            return price
+        logger.warning(f"No price found for {competitor_name}: {url}")
+        return None
+
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Request error for {competitor_name}: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Error scraping {competitor_name}: {e}")
+        return None
@@ -0,0 +1,84 @@
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from competitor_profiles import get_profile
+from parser_backend import get_parser_backend
+from scraper_config import PARSE_WORKERS
+from selector_stats import SelectorStats
+
+logger = logging.getLogger(__name__)
+
+# Extractor owned by each worker process, created by _init_worker
+_worker_extractor = None
+
+
+class PageExtractor:
+    """
+    Everything a parse worker needs to extract a price: the compiled
+    competitor profiles, the parser backend and the selector order learned
+    by the scraper's `selector_stats` (read only; hits are recorded by the
+    scraper process).
+    """
+
+    def __init__(self, parser_backend: Optional[str] = None, stats_name: Optional[str] = None):
+        self.parser_backend = get_parser_backend(parser_backend)
+        self.selector_stats = SelectorStats(stats_name) if stats_name else None
+
+    def extract(self, body: bytes, encoding: Optional[str], competitor_name: str,
+                partial: bool = False) -> Tuple[Optional[str], Optional[str]]:
+        return get_profile(competitor_name).extract_price(body, self.parser_backend, self.selector_stats,
+                                                          partial, encoding)
+
+
+def extractor_factory(parser_backend: Optional[str] = None,
+                      stats_name: Optional[str] = None) -> Callable[[], PageExtractor]:
+    """
+    Picklable factory for the workers' PageExtractor
+    """
+    return functools.partial(PageExtractor, parser_backend, stats_name)
+
+
+def _init_worker(factory: Callable[[], PageExtractor]):
+    global _worker_extractor
+    _worker_extractor = factory()
+
+
+def _parse(body: bytes, encoding: Optional[str], competitor_name: str,
+           partial: bool) -> Tuple[Optional[str], Optional[str]]:
+    return _worker_extractor.extract(body, encoding, competitor_name, partial)
+
+
+class ParsePool:
+    """
+    Process pool that extracts prices off the fetching threads, so HTML
+    parsing can use every core instead of contending for the GIL with
+    network I/O.
+
+    Raw response bytes are shipped to the workers and handed to the parser
+    undecoded, together with the page's resolved charset. Each worker builds
+    one PageExtractor with `factory` (see `extractor_factory`), rather than a
+    whole scraper with its sessions, caches and drivers.
+    """
+
+    def __init__(self, factory: Callable[[], PageExtractor], workers: Optional[int] = PARSE_WORKERS):
+        # 'spawn' avoids forking a process that already runs fetch threads
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(factory,)
+        )
+
+    def parse(self, body: bytes, encoding: Optional[str], competitor_name: str,
+              partial: bool = False) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Extract a (price, winning selector) pair from raw HTML bytes on a worker
+        process. Blocks the calling (fetch) thread until the result is ready.
+        """
+        return self.executor.submit(_parse, body, encoding, competitor_name, partial).result()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,85 @@
+import codecs
+import importlib
+import logging
+import re
+from typing import Optional
+
+from bs4 import BeautifulSoup
+
+from scraper_config import PARSER_BACKEND
+
+logger = logging.getLogger(__name__)
+
+# BeautifulSoup tree builders we support, fastest first, with the module each one needs
+BACKEND_MODULES = {
+    'lxml': 'lxml',
+    'html.parser': None,
+}
+FALLBACK_BACKEND = 'html.parser'
+
+# Charset declarations: the Content-Type header's charset parameter, and
+# <meta charset="..."> / <meta http-equiv="Content-Type" content="...; charset=...">
+CHARSET_HEADER_RE = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
+# A <meta> charset has to appear within the first 1024 bytes; allow some slack
+META_SCAN_BYTES = 2048
+DEFAULT_CHARSET = 'utf-8'
+
+_available = {}
+
+
+def is_available(backend: str) -> bool:
+    """
+    Whether a parser backend can be used in this environment
+    """
+    if backend not in BACKEND_MODULES:
+        return False
+    if backend not in _available:
+        module = BACKEND_MODULES[backend]
+        try:
+            if module:
+                importlib.import_module(module)
+            _available[backend] = True
+        except ImportError:
+            _available[backend] = False
+    return _available[backend]
+
+
+def get_parser_backend(preferred: Optional[str] = None) -> str:
+    """
+    The preferred backend (PARSER_BACKEND by default) if it is installed,
+    otherwise Python's built-in html.parser
+    """
+    preferred = preferred or PARSER_BACKEND
+    if is_available(preferred):
+        return preferred
+    logger.warning(f"Parser backend '{preferred}' is not available, using '{FALLBACK_BACKEND}'")
+    return FALLBACK_BACKEND
+
+
+def resolve_charset(content_type: Optional[str], body: bytes) -> str:
+    """
+    Charset of a page: from the Content-Type header, else from a <meta>
+    declaration near the start of the body, else UTF-8
+    """
+    match = CHARSET_HEADER_RE.search(content_type or '')
+    charset = match.group(1) if match else None
+    if charset is None:
+        match = META_CHARSET_RE.search(body, 0, META_SCAN_BYTES)
+        charset = match.group(1).decode('ascii') if match else None
+    if charset:
+        try:
+            return codecs.lookup(charset).name
+        except LookupError:
+            logger.debug(f"Unknown charset '{charset}', using {DEFAULT_CHARSET}")
+    return DEFAULT_CHARSET
+
+
+def make_soup(html_content, backend: Optional[str] = None, encoding: Optional[str] = None) -> BeautifulSoup:
+    """
+    Build a BeautifulSoup tree with the selected backend. Raw bytes are handed
+    to the parser as they are, decoded with `encoding` when it is known.
+    """
+    if encoding and isinstance(html_content, bytes):
+        return BeautifulSoup(html_content, backend or get_parser_backend(), from_encoding=encoding)
+    return BeautifulSoup(html_content, backend or get_parser_backend())
@@ -0,0 +1,68 @@
+import re
+from typing import Callable, Iterator, Optional, Pattern, Tuple
+
+# One compiled pattern that scans the text once. Alternatives are tried in
+# order at each position, so a number directly preceded by Rs/PKR is caught as
+# `prefixed` and a number followed by Rs/PKR as `suffixed` before falling back
+# to a `bare` number. The suffix is only looked ahead at, so it can still
+# prefix the next price ("500 Rs 450").
+PRICE_RE = re.compile(
+    r'(?:Rs\.?|PKR)\s*(?P<prefixed>[\d,]+(?:\.\d{2})?)'
+    r'|(?P<suffixed>[\d,]+(?:\.\d{2})?)(?=\s*(?:Rs|PKR))'
+    r'|(?P<bare>[\d,]+(?:\.\d{2})?)',
+    re.IGNORECASE
+)
+
+# Lower rank wins: a currency prefix is the most reliable signal
+RANKS = {'prefixed': 0, 'suffixed': 1, 'bare': 2}
+CONFIDENT_RANK = 0
+
+
+def is_valid_price(price_str: str) -> bool:
+    """
+    Validate if a string represents a valid price (between 1 and 100000)
+    """
+    try:
+        price = float(price_str.replace(',', ''))
+        return 1 <= price <= 100000
+    except (ValueError, TypeError):
+        return False
+
+
+def format_price(price_str: str) -> str:
+    """
+    Format price string consistently (two decimals, no thousands separators)
+    """
+    try:
+        price = float(price_str.replace(',', ''))
+        return f"{price:.2f}"
+    except (ValueError, TypeError):
+        return price_str
+
+
+def price_candidates(text: str, is_valid: Callable[[str], bool] = is_valid_price,
+                     pattern: Pattern = PRICE_RE) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (rank, price) for every valid price in the text, in document order.
+    Prices are returned without thousands separators.
+    """
+    for match in pattern.finditer(text):
+        kind = match.lastgroup
+        price = match.group(kind).replace(',', '')
+        if is_valid(price):
+            yield RANKS[kind], price
+
+
+def extract_price_from_text(text: str, is_valid: Callable[[str], bool] = is_valid_price,
+                            pattern: Pattern = PRICE_RE) -> Optional[str]:
+    """
+    Best price in the text: the first Rs/PKR-prefixed price (returned as soon
+    as it is seen), else the first suffixed price, else the first bare number
+    """
+    best = None
+    for rank, price in price_candidates(text, is_valid, pattern):
+        if rank == CONFIDENT_RANK:
+            return price
+        if best is None or rank < best[0]:
+            best = (rank, price)
+    return best[1] if best else None
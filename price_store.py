@@ -0,0 +1,365 @@
+import logging
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from scraper_config import COMPETITOR_HOSTS, PRICE_HISTORY_MONTHS_AHEAD
+from unified_prices import MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT, ensure_sku_index
+
+logger = logging.getLogger(__name__)
+
+PRODUCTS_TABLE = 'products'
+# Append-only history: a row only when a (SKU, competitor) price changes
+PRICES_TABLE = 'competitor_prices'
+# Materialized latest scrape of every (SKU, competitor) pair; the hot table
+CURRENT_TABLE = 'current_prices'
+# Per-connection staging area for one save_prices batch
+STAGING_TABLE = 'staged_prices'
+# CURRENT_TABLE under the name readers used before it existed
+LATEST_VIEW = 'latest_competitor_prices'
+# The old wide layout, rebuilt from the tables above for existing readers
+UNIFIED_VIEW = 'unified_competitor_prices'
+LEGACY_TABLE = 'unified_competitor_prices_legacy'
+
+# The history's primary key (sku, competitor, scraped_at) clusters a pair's
+# changes together; idx_competitor_scraped serves per-competitor "changed
+# since" queries. The table is range-partitioned by month of scraped_at (see
+# _ensure_partitions), so old months can be dropped without touching the rest.
+SCHEMA = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {PRODUCTS_TABLE} (
+        sku VARCHAR(255) NOT NULL PRIMARY KEY,
+        my_price DECIMAL(12, 2) NULL
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {PRICES_TABLE} (
+        sku VARCHAR(255) NOT NULL,
+        competitor VARCHAR(50) NOT NULL,
+        price DECIMAL(12, 2) NULL,
+        link TEXT NULL,
+        scraped_at DATETIME NOT NULL,
+        PRIMARY KEY (sku, competitor, scraped_at),
+        KEY idx_competitor_scraped (competitor, scraped_at)
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {CURRENT_TABLE} (
+        sku VARCHAR(255) NOT NULL,
+        competitor VARCHAR(50) NOT NULL,
+        price DECIMAL(12, 2) NULL,
+        link TEXT NULL,
+        scraped_at DATETIME NOT NULL,
+        changed_at DATETIME NOT NULL,
+        PRIMARY KEY (sku, competitor),
+        KEY idx_competitor_changed (competitor, changed_at)
+    )
+    """,
+]
+
+
+def to_price(value) -> Optional[Decimal]:
+    """
+    A scraped price string ('1,250.00', 'None', '') as a Decimal, or None
+    """
+    if value is None or isinstance(value, Decimal):
+        return value
+    try:
+        price = Decimal(str(value).replace(',', '').strip())
+    except InvalidOperation:
+        return None
+    return price if price.is_finite() else None
+
+
+def _decimal_sql(column: str) -> str:
+    # The legacy VARCHAR cells hold numbers, 'None' or ''; only numbers survive
+    cleaned = f"REPLACE(TRIM({column}), ',', '')"
+    return f"CASE WHEN {cleaned} REGEXP '^[0-9]+([.][0-9]+)?$' THEN CAST({cleaned} AS DECIMAL(12, 2)) END"
+
+
+def _table_type(cursor, table: str) -> Optional[str]:
+    cursor.execute(
+        "SELECT TABLE_TYPE FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,)
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _legacy_competitors(cursor, table: str) -> List[str]:
+    cursor.execute(
+        "SELECT COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,)
+    )
+    columns = {row[0] for row in cursor.fetchall()}
+    return sorted(
+        column[:-len('_price')] for column in columns
+        if column.endswith('_price') and column != 'my_price'
+        and f"{column[:-len('_price')]}_link" in columns
+    )
+
+
+def _migrate_unified_table(conn, cursor) -> bool:
+    # Copy the wide unified_competitor_prices table, if there still is one,
+    # into the normalized tables and rename it to LEGACY_TABLE. Price strings
+    # become DECIMAL ('None' / empty cells aren't copied); every copied price
+    # is stamped with the migration time.
+    if _table_type(cursor, UNIFIED_VIEW) != 'BASE TABLE':
+        return False
+    logger.info(f"Migrating {UNIFIED_VIEW} to {PRODUCTS_TABLE} / {PRICES_TABLE}...")
+    # One row per SKU first, so each SKU's prices are copied once
+    ensure_sku_index(conn)
+
+    has_sku = "SKU IS NOT NULL AND TRIM(SKU) <> ''"
+    cursor.execute(f"""
+        INSERT INTO {PRODUCTS_TABLE} (sku, my_price)
+        SELECT TRIM(SKU), {_decimal_sql('my_price')} FROM {UNIFIED_VIEW} WHERE {has_sku}
+        ON DUPLICATE KEY UPDATE my_price = VALUES(my_price)
+    """)
+    migrated_at = datetime.now().replace(microsecond=0)
+    for competitor in _legacy_competitors(cursor, UNIFIED_VIEW):
+        price, link = f"{competitor}_price", f"{competitor}_link"
+        cursor.execute(f"""
+            INSERT INTO {PRICES_TABLE} (sku, competitor, price, link, scraped_at)
+            SELECT TRIM(SKU), %s, {_decimal_sql(price)}, NULLIF(TRIM({link}), ''), %s
+            FROM {UNIFIED_VIEW}
+            WHERE {has_sku} AND {_decimal_sql(price)} IS NOT NULL
+            ON DUPLICATE KEY UPDATE price = VALUES(price), link = VALUES(link)
+        """, (competitor, migrated_at))
+        logger.info(f"Migrated {cursor.rowcount} {competitor} prices")
+    conn.commit()
+    cursor.execute(f"RENAME TABLE {UNIFIED_VIEW} TO {LEGACY_TABLE}")
+    logger.info(f"✅ Migrated {UNIFIED_VIEW}; the old table is kept as {LEGACY_TABLE}")
+    return True
+
+
+def _compact_history(cursor):
+    # Earlier versions stored every scrape, including failed ones; keep only
+    # the rows where a pair's price differs from its previous row
+    cursor.execute(f"DELETE FROM {PRICES_TABLE} WHERE price IS NULL")
+    cursor.execute(f"""
+        DELETE h FROM {PRICES_TABLE} h
+        JOIN (
+            SELECT sku, competitor, scraped_at FROM (
+                SELECT sku, competitor, scraped_at, price,
+                       LAG(price) OVER w AS previous_price,
+                       ROW_NUMBER() OVER w AS n
+                FROM {PRICES_TABLE}
+                WINDOW w AS (PARTITION BY sku, competitor ORDER BY scraped_at)
+            ) scrapes
+            WHERE n > 1 AND price <=> previous_price
+        ) unchanged USING (sku, competitor, scraped_at)
+    """)
+    logger.info(f"Removed {cursor.rowcount} unchanged rows from {PRICES_TABLE}")
+
+
+def _materialize_current(cursor):
+    # Rebuild CURRENT_TABLE from the newest history row of every pair
+    cursor.execute(f"""
+        INSERT INTO {CURRENT_TABLE} (sku, competitor, price, link, scraped_at, changed_at)
+        SELECT h.sku, h.competitor, h.price, h.link, h.scraped_at, h.scraped_at
+        FROM {PRICES_TABLE} h
+        JOIN (
+            SELECT sku, competitor, MAX(scraped_at) AS scraped_at
+            FROM {PRICES_TABLE} GROUP BY sku, competitor
+        ) latest USING (sku, competitor, scraped_at)
+        ON DUPLICATE KEY UPDATE price = VALUES(price), link = VALUES(link),
+            scraped_at = VALUES(scraped_at), changed_at = VALUES(changed_at)
+    """)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition(month: date) -> str:
+    # pYYYYMM holds the rows scraped in that month
+    return f"PARTITION p{month:%Y%m} VALUES LESS THAN (TO_DAYS('{_add_months(month, 1)}'))"
+
+
+def _ensure_partitions(cursor, months_ahead: int = PRICE_HISTORY_MONTHS_AHEAD):
+    # Partition the history by month and keep partitions ready for this
+    # month and the next `months_ahead`; p_future catches anything later
+    cursor.execute(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL",
+        (PRICES_TABLE,)
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+    this_month = date.today().replace(day=1)
+    last_month = _add_months(this_month, months_ahead)
+    future = "PARTITION p_future VALUES LESS THAN MAXVALUE"
+
+    if not existing:
+        cursor.execute(f"SELECT MIN(scraped_at) FROM {PRICES_TABLE}")
+        oldest = cursor.fetchone()[0]
+        month = min(this_month, oldest.date().replace(day=1)) if oldest else this_month
+        partitions = [f"PARTITION p_old VALUES LESS THAN (TO_DAYS('{month}'))"]
+        while month <= last_month:
+            partitions.append(_partition(month))
+            month = _add_months(month, 1)
+        logger.info(f"Partitioning {PRICES_TABLE} by month...")
+        cursor.execute(f"""
+            ALTER TABLE {PRICES_TABLE} PARTITION BY RANGE (TO_DAYS(scraped_at)) (
+                {', '.join(partitions + [future])}
+            )
+        """)
+        return
+
+    newest = max(date(int(name[1:5]), int(name[5:7]), 1) for name in existing if name[1:].isdigit())
+    month = _add_months(newest, 1)
+    partitions = []
+    while month <= last_month:
+        partitions.append(_partition(month))
+        month = _add_months(month, 1)
+    if partitions:
+        cursor.execute(f"""
+            ALTER TABLE {PRICES_TABLE} REORGANIZE PARTITION p_future INTO (
+                {', '.join(partitions + [future])}
+            )
+        """)
+        logger.info(f"Added {len(partitions)} monthly partitions to {PRICES_TABLE}")
+
+
+def _create_views(cursor, competitor_names: Sequence[str]):
+    cursor.execute(f"""
+        CREATE OR REPLACE VIEW {LATEST_VIEW} AS
+        SELECT sku, competitor, price, link, scraped_at FROM {CURRENT_TABLE}
+    """)
+    pivot = []
+    for competitor in competitor_names:
+        pivot.append(f"MAX(CASE WHEN c.competitor = '{competitor}' THEN c.price END) AS {competitor}_price")
+        pivot.append(f"MAX(CASE WHEN c.competitor = '{competitor}' THEN c.link END) AS {competitor}_link")
+    cursor.execute(f"""
+        CREATE OR REPLACE VIEW {UNIFIED_VIEW} AS
+        SELECT pr.sku AS SKU, pr.my_price, {', '.join(pivot)}
+        FROM {PRODUCTS_TABLE} pr
+        LEFT JOIN {CURRENT_TABLE} c ON c.sku = pr.sku
+        GROUP BY pr.sku, pr.my_price
+    """)
+
+
+def create_schema(conn, competitor_names: Sequence[str] = tuple(COMPETITOR_HOSTS)):
+    """
+    Create the price tables and views and bring older databases up to date:
+    the old wide table is migrated into the normalized tables, a history
+    that still has a row per scrape is compacted to changes only and
+    CURRENT_TABLE is materialized from it, and the history gets its monthly
+    partitions. UNIFIED_VIEW keeps the old column layout (SKU, my_price,
+    <Competitor>_price, <Competitor>_link) with typed prices, one column
+    pair per name in `competitor_names`. Runs under the migration lock, so
+    scrapers started together don't migrate twice.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("Timed out waiting for the price schema migration lock")
+        try:
+            new_current = _table_type(cursor, CURRENT_TABLE) is None
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            migrated = _migrate_unified_table(conn, cursor)
+            if new_current or migrated:
+                _compact_history(cursor)
+                _materialize_current(cursor)
+                conn.commit()
+            _ensure_partitions(cursor)
+            _create_views(cursor, competitor_names)
+            conn.commit()
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def save_prices(conn, rows: Iterable[Dict[str, str]], competitor_names: Sequence[str],
+                update_my_price: bool = False, scraped_at: Optional[datetime] = None,
+                reused: Collection[Tuple[str, str]] = ()) -> int:
+    """
+    Write scraper result rows (SKU, my_price, <Competitor>_price,
+    <Competitor>_link), stamped `scraped_at` (now by default). Every
+    (SKU, competitor) price goes to CURRENT_TABLE; only prices that differ
+    from the current one are appended to the history. A scrape that found
+    no price isn't stored, so a transient failure neither blanks the known
+    price nor adds history rows. Nor are the (SKU, competitor) pairs in
+    `reused`, whose last price was reused without fetching the page, so
+    scraped_at stays the time a price was actually seen. Products new to
+    the table are added with their my_price; known ones only get it updated
+    with `update_my_price=True`. Returns the number of price changes recorded.
+    """
+    scraped_at = (scraped_at or datetime.now()).replace(microsecond=0)
+    products = {}
+    prices = {}
+    for row in rows:
+        sku = (row.get('SKU') or '').strip()
+        if not sku:
+            continue
+        products[sku] = to_price(row.get('my_price'))
+        for competitor in competitor_names:
+            link = (row.get(f"{competitor}_link") or '').strip() or None
+            price = to_price(row.get(f"{competitor}_price"))
+            if price is None or (sku, competitor) in reused:
+                continue
+            prices[sku, competitor] = (sku, competitor, price, link, scraped_at)
+    if not products:
+        return 0
+
+    my_price_update = "my_price = VALUES(my_price)" if update_my_price else "sku = sku"
+    cursor = conn.cursor()
+    try:
+        # Same key order in every writer, so concurrent batches lock rows in the same order
+        cursor.executemany(f"""
+            INSERT INTO {PRODUCTS_TABLE} (sku, my_price) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE {my_price_update}
+        """, sorted(products.items()))
+        if not prices:
+            conn.commit()
+            return 0
+
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {STAGING_TABLE}")
+        cursor.execute(f"""
+            CREATE TEMPORARY TABLE {STAGING_TABLE} (
+                sku VARCHAR(255) NOT NULL,
+                competitor VARCHAR(50) NOT NULL,
+                price DECIMAL(12, 2) NOT NULL,
+                link TEXT NULL,
+                scraped_at DATETIME NOT NULL,
+                PRIMARY KEY (sku, competitor)
+            )
+        """)
+        cursor.executemany(f"""
+            INSERT INTO {STAGING_TABLE} (sku, competitor, price, link, scraped_at)
+            VALUES (%s, %s, %s, %s, %s)
+        """, [prices[key] for key in sorted(prices)])
+
+        # History first: it compares against the current prices before they're replaced
+        changed = f"""
+            FROM {STAGING_TABLE} s
+            LEFT JOIN {CURRENT_TABLE} c ON c.sku = s.sku AND c.competitor = s.competitor
+            WHERE c.sku IS NULL OR NOT (c.price <=> s.price)
+        """
+        # Counted separately: an upsert's rowcount counts updated rows twice
+        cursor.execute(f"SELECT COUNT(*) {changed}")
+        changes = cursor.fetchone()[0]
+        cursor.execute(f"""
+            INSERT INTO {PRICES_TABLE} (sku, competitor, price, link, scraped_at)
+            SELECT s.sku, s.competitor, s.price, s.link, s.scraped_at {changed}
+            ON DUPLICATE KEY UPDATE price = VALUES(price), link = VALUES(link)
+        """)
+        # changed_at is assigned before price, so it still sees the old price
+        cursor.execute(f"""
+            INSERT INTO {CURRENT_TABLE} (sku, competitor, price, link, scraped_at, changed_at)
+            SELECT sku, competitor, price, link, scraped_at, scraped_at FROM {STAGING_TABLE}
+            ON DUPLICATE KEY UPDATE
+                changed_at = IF({CURRENT_TABLE}.price <=> VALUES(price), {CURRENT_TABLE}.changed_at, VALUES(changed_at)),
+                price = VALUES(price), link = VALUES(link), scraped_at = VALUES(scraped_at)
+        """)
+        cursor.execute(f"DROP TEMPORARY TABLE {STAGING_TABLE}")
+    finally:
+        cursor.close()
+    conn.commit()
+    logger.info(f"Stored {len(prices)} prices, {changes} of them changed")
+    return changes
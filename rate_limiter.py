@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+from scraper_config import COMPETITOR_HOSTS, RATE_LIMITS, DEFAULT_RATE_LIMIT
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Tokens refill at `rate` per second up to `burst`.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = float(rate)
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take one token and return how many seconds the caller has to wait
+        before using it. The balance may go negative, which queues callers in
+        the order they reserved.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class DomainRateLimiter:
+    """
+    One token bucket per host, configured per competitor from RATE_LIMITS
+    """
+
+    def __init__(self, rate_limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self.host_limits = {}
+        for comp_name, limit in (rate_limits or RATE_LIMITS).items():
+            host = COMPETITOR_HOSTS.get(comp_name, comp_name)
+            self.host_limits[host] = limit
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def get_bucket(self, host: str) -> TokenBucket:
+        with self.lock:
+            if host not in self.buckets:
+                limit = self.host_limits.get(host, DEFAULT_RATE_LIMIT)
+                self.buckets[host] = TokenBucket(limit['rate'], limit['burst'])
+            return self.buckets[host]
+
+    def acquire(self, host: str):
+        """
+        Block until a request to `host` is allowed
+        """
+        delay = self.get_bucket(host).reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, host: str):
+        """
+        Wait (without blocking the event loop) until a request to `host` is allowed
+        """
+        delay = self.get_bucket(host).reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
@@ -0,0 +1,125 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from scraper_config import SCHEDULE_DIR, STALENESS_THRESHOLD, DEFAULT_CHANGE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class RescrapeScheduler:
+    """
+    Decide which (SKU, competitor) prices are worth re-scraping.
+
+    For every pair it remembers the last price, when it was last scraped and
+    how often the price changed over the observed period. Changes are modelled
+    as a Poisson process, so the chance that a price changed since the last
+    scrape is 1 - exp(-rate * elapsed). Only pairs above `threshold` are due.
+    """
+
+    def __init__(self, name: str, threshold: float = STALENESS_THRESHOLD,
+                 full_refresh: bool = False, schedule_dir: str = SCHEDULE_DIR):
+        os.makedirs(schedule_dir, exist_ok=True)
+        self.path = os.path.join(schedule_dir, f"{name}.json")
+        self.threshold = threshold
+        self.full_refresh = full_refresh
+        self.lock = threading.Lock()
+        self.state: Dict[str, dict] = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (ValueError, OSError) as e:
+            logger.warning(f"Ignoring unreadable schedule {self.path}: {e}")
+            return {}
+
+    @staticmethod
+    def _key(sku: str, competitor: str) -> str:
+        return f"{competitor}|{sku}"
+
+    def change_rate(self, entry: dict) -> float:
+        """
+        Estimated price changes per second. One change per DEFAULT_CHANGE_INTERVAL
+        acts as a prior, so a new pair isn't assumed to never change.
+        """
+        observed = max(0.0, entry['last_scraped'] - entry['first_scraped'])
+        return (entry['changes'] + 1) / (observed + DEFAULT_CHANGE_INTERVAL)
+
+    def staleness(self, sku: str, competitor: str, now: Optional[float] = None) -> float:
+        """
+        Probability that the price changed since it was last scraped
+        (1.0 for pairs that were never scraped)
+        """
+        entry = self.state.get(self._key(sku, competitor))
+        if entry is None:
+            return 1.0
+        if now is None:
+            now = time.time()
+        elapsed = max(0.0, now - entry['last_scraped'])
+        return 1.0 - math.exp(-self.change_rate(entry) * elapsed)
+
+    def is_due(self, sku: str, competitor: str, link: str = '', now: Optional[float] = None) -> bool:
+        """
+        Whether a pair should be scraped this run. A changed product link
+        always makes it due.
+        """
+        if self.full_refresh:
+            return True
+        entry = self.state.get(self._key(sku, competitor))
+        if entry is None or entry.get('link', '') != link:
+            return True
+        return self.staleness(sku, competitor, now) >= self.threshold
+
+    def last_price(self, sku: str, competitor: str) -> Optional[str]:
+        entry = self.state.get(self._key(sku, competitor))
+        return entry['price'] if entry else None
+
+    def record(self, sku: str, competitor: str, price: Optional[str], link: str = '',
+               now: Optional[float] = None):
+        """
+        Record a scrape result. Failed scrapes aren't recorded, so the pair
+        stays due on the next run.
+        """
+        if not price:
+            return
+        if now is None:
+            now = time.time()
+        key = self._key(sku, competitor)
+        with self.lock:
+            entry = self.state.get(key)
+            if entry is None:
+                self.state[key] = {
+                    'price': price,
+                    'link': link,
+                    'first_scraped': now,
+                    'last_scraped': now,
+                    'observations': 1,
+                    'changes': 0,
+                }
+                return
+            if entry['price'] != price:
+                entry['changes'] += 1
+            entry['price'] = price
+            entry['link'] = link
+            entry['last_scraped'] = now
+            entry['observations'] += 1
+
+    def save(self):
+        """
+        Write the schedule to disk atomically
+        """
+        tmp_path = self.path + '.tmp'
+        with self.lock:
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as file:
+                    json.dump(self.state, file)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Could not save schedule {self.path}: {e}")
@@ -0,0 +1,70 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from scraper_config import JOURNAL_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class ScrapeJournal:
+    """
+    Append-only JSON-lines journal with one line per (SKU, competitor) price,
+    written as soon as the price is obtained.
+
+    A fresh run truncates the journal. With `resume=True` the existing lines
+    are loaded instead, so pairs finished before a crash can be skipped.
+    Pairs whose scrape found no price count as finished too.
+    """
+
+    def __init__(self, name: str, resume: bool = False, journal_dir: str = JOURNAL_DIR):
+        os.makedirs(journal_dir, exist_ok=True)
+        self.path = os.path.join(journal_dir, f"{name}.jsonl")
+        self.entries: Dict[Tuple[str, str], Optional[str]] = {}
+        self.lock = threading.Lock()
+        if resume:
+            self._load()
+            logger.info(f"Resuming: {len(self.entries)} completed (SKU, competitor) pairs in {self.path}")
+        self.file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Last line may be cut short by the crash we're resuming from
+                        continue
+                    self.entries[(entry['SKU'], entry['competitor'])] = entry['price']
+        except FileNotFoundError:
+            pass
+
+    def is_done(self, sku: str, competitor: str) -> bool:
+        return (sku, competitor) in self.entries
+
+    def get_price(self, sku: str, competitor: str) -> Optional[str]:
+        return self.entries.get((sku, competitor))
+
+    def record(self, sku: str, competitor: str, price: Optional[str], link: str = ''):
+        """
+        Append one result and flush it to disk straight away
+        """
+        line = json.dumps({
+            'SKU': sku,
+            'competitor': competitor,
+            'price': price,
+            'link': link,
+            'scraped_at': time.time(),
+        })
+        with self.lock:
+            self.entries[(sku, competitor)] = price
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
+
+from scraper_config import SELECTOR_STATS_DIR, DEAD_SELECTOR_MIN_PAGES
+
+logger = logging.getLogger(__name__)
+
+# Labels recorded for extraction tiers that are not CSS selectors: the whole
+# page text fallback, Metro's embedded Next.js JSON and schema.org data
+PAGE_TEXT = 'page-text'
+NEXT_DATA = '__NEXT_DATA__'
+STRUCTURED_DATA = 'structured-data'
+# Tiers tried before the selectors; a page they win never reaches the selectors
+PRE_SELECTOR_TIERS = (NEXT_DATA, STRUCTURED_DATA)
+
+
+class SelectorStats:
+    """
+    Hit counts of the selector that produced the accepted price, per competitor.
+
+    Counts are loaded from and saved to `<name>.json` in SELECTOR_STATS_DIR so
+    that `ordered()` can put the selectors that usually win first; the
+    configured order only breaks ties. Every script uses its own name, as
+    only one process may write a stats file.
+    """
+
+    def __init__(self, name: str, stats_dir: str = SELECTOR_STATS_DIR):
+        os.makedirs(stats_dir, exist_ok=True)
+        self.path = os.path.join(stats_dir, f"{name}.json")
+        self.lock = threading.Lock()
+        self.data: Dict[str, dict] = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (ValueError, OSError) as e:
+            logger.warning(f"Ignoring unreadable selector stats {self.path}: {e}")
+            return {}
+
+    def _competitor(self, competitor: str) -> dict:
+        # Caller holds self.lock. 'swept' counts the pages the selectors ran on
+        stats = self.data.setdefault(competitor, {'pages': 0, 'hits': {}})
+        stats.setdefault('swept', 0)
+        return stats
+
+    def ordered(self, competitor: str, selectors: List[str]) -> List[str]:
+        """
+        Selectors sorted by hit count, most successful first
+        """
+        hits = self.data.get(competitor, {}).get('hits', {})
+        return sorted(selectors, key=lambda selector: -hits.get(selector, 0))
+
+    def record(self, competitor: str, selector: Optional[str]):
+        """
+        Record one extracted page and the selector that won it (None if no price was found)
+        """
+        with self.lock:
+            stats = self._competitor(competitor)
+            stats['pages'] += 1
+            if selector not in PRE_SELECTOR_TIERS:
+                stats['swept'] += 1
+            if selector:
+                stats['hits'][selector] = stats['hits'].get(selector, 0) + 1
+
+    def dead_selectors(self, competitor: str, selectors: List[str]) -> List[str]:
+        """
+        Selectors that never produced a price once the selectors have run on
+        enough pages (pages won by the JSON or structured-data tiers don't count)
+        """
+        stats = self.data.get(competitor, {'pages': 0, 'hits': {}})
+        if stats.get('swept', 0) < DEAD_SELECTOR_MIN_PAGES:
+            return []
+        return [selector for selector in selectors if not stats['hits'].get(selector)]
+
+    def log_report(self, competitor: str, selectors: List[str]):
+        """
+        Log the winning selectors and the dead ones for a competitor
+        """
+        stats = self.data.get(competitor)
+        if not stats or not stats['pages']:
+            return
+        top = sorted(stats['hits'].items(), key=lambda item: -item[1])[:5]
+        logger.info(f"{competitor} selector hits over {stats['pages']} pages "
+                    f"({stats.get('swept', 0)} reached the selectors): {top}")
+        dead = self.dead_selectors(competitor, selectors)
+        if dead:
+            logger.info(f"{competitor} dead selectors ({len(dead)}): {dead}")
+
+    def save(self):
+        """
+        Write the counts to disk atomically
+        """
+        tmp_path = self.path + '.tmp'
+        with self.lock:
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as file:
+                    json.dump(self.data, file, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Could not save selector stats {self.path}: {e}")
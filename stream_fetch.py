@@ -0,0 +1,121 @@
+import logging
+import re
+from typing import Callable, List, Optional, Pattern, Tuple
+
+import requests
+
+from parser_backend import resolve_charset
+from scraper_config import STREAM_CHUNK_SIZE, STREAM_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Longest marker we look for; new chunks are scanned together with this much
+# of the previous data so a marker split across two chunks is still found
+SCAN_OVERLAP = 64
+
+
+def marker_pattern(markers: List[bytes]) -> Pattern:
+    """
+    Pattern finding the tags whose markup (e.g. a class attribute) holds one
+    of the markers. <script> and <style> blocks and comments are matched as a
+    whole, so that `find_marker` can step over a marker in inline JS or CSS.
+    """
+    alternatives = b'|'.join(re.escape(marker) for marker in markers)
+    return re.compile(
+        rb'(?P<skip><(?P<raw>script|style)\b.*?(?:</(?P=raw)\s*>|\Z)|<!--.*?(?:-->|\Z))'
+        rb'|<[a-zA-Z][^<>]*?(?:' + alternatives + rb')',
+        re.DOTALL | re.IGNORECASE
+    )
+
+
+def find_marker(pattern: Pattern, data: bytes, start: int = 0) -> Tuple[Optional[int], int]:
+    """
+    Start of the first tag carrying a marker at or after `start`, outside
+    scripts, styles and comments (None if there is none yet), and where a
+    search of the same data with more bytes appended should resume.
+    """
+    resume = start
+    for match in pattern.finditer(data, start):
+        if match.group('skip') is None:
+            return match.start(), match.end()
+        if match.end() == len(data):
+            # The block may still be open; look at it again once more has arrived
+            return None, match.start()
+        resume = match.end()
+    # A tag cut off at the end of the data may turn out to hold a marker
+    tag_start = data.rfind(b'<', resume)
+    return None, tag_start if tag_start != -1 else len(data)
+
+
+class StreamScanner:
+    """
+    Decides, chunk by chunk, when enough of a page has arrived to try the
+    extraction fast paths: a structured-data price signal has been seen, or
+    `window` bytes have arrived after a tag carrying one of the price markers
+    (see `marker_pattern`).
+
+    Only the newly received bytes are scanned, so a page is searched once no
+    matter how many chunks it arrives in.
+    """
+
+    def __init__(self, signals: List[bytes], marker_re: Optional[Pattern], window: int):
+        self.signals = signals
+        self.marker_re = marker_re
+        self.window = window
+        self.scanned = 0
+        self.marker_resume = 0
+        self.marker_end: Optional[int] = None
+
+    def ready(self, buffer: bytearray) -> bool:
+        start = max(0, self.scanned - SCAN_OVERLAP)
+        self.scanned = len(buffer)
+        if any(buffer.find(signal, start) != -1 for signal in self.signals):
+            return True
+        if self.marker_end is None and self.marker_re is not None:
+            position, self.marker_resume = find_marker(self.marker_re, buffer, self.marker_resume)
+            if position is not None:
+                self.marker_end = position + self.window
+        return self.marker_end is not None and len(buffer) >= self.marker_end
+
+
+def read_price(response: requests.Response, scanner: StreamScanner,
+               parse: Callable[[bytes, str, bool], Tuple[Optional[str], Optional[str]]],
+               chunk_size: int = STREAM_CHUNK_SIZE,
+               max_bytes: int = STREAM_MAX_BYTES) -> Tuple[Optional[str], Optional[str], bytes, str]:
+    """
+    Read a streamed (`stream=True`) response until `scanner` says the price
+    should have arrived and parse just that prefix, as
+    `parse(body, charset, True)`. Only if that finds no price is the rest of
+    the page read and parsed, as `parse(body, charset, False)`. Never reads
+    more than `max_bytes`.
+
+    The body stays raw bytes throughout; its charset is resolved once, from the
+    Content-Type header or the page's <meta> declaration. Returns
+    (price, selector, body read, charset) and always closes the response.
+    """
+    buffer = bytearray()
+    charset = None
+    tried_prefix = False
+    try:
+        for chunk in response.iter_content(chunk_size):
+            buffer += chunk
+            if charset is None:
+                charset = resolve_charset(response.headers.get('Content-Type'), buffer)
+            if len(buffer) >= max_bytes:
+                logger.warning(f"Stopped reading {response.url} at {max_bytes} bytes")
+                del buffer[max_bytes:]
+                break
+            if not tried_prefix and scanner.ready(buffer):
+                tried_prefix = True
+                body = bytes(buffer)
+                price, selector = parse(body, charset, True)
+                if price:
+                    logger.debug(f"Price found after {len(body)} bytes of {response.url}")
+                    return price, selector, body, charset
+                # Otherwise keep reading and parse the whole page
+        body = bytes(buffer)
+        charset = charset or resolve_charset(response.headers.get('Content-Type'), body)
+        price, selector = parse(body, charset, False)
+        return price, selector, body, charset
+    finally:
+        response.close()
@@ -0,0 +1,91 @@
+import json
+import logging
+import re
+from collections import deque
+from typing import Any, Iterator
+
+logger = logging.getLogger(__name__)
+
+# All patterns work on the raw page bytes
+LD_JSON_RE = re.compile(
+    rb'<script[^>]*\btype=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.DOTALL | re.IGNORECASE
+)
+# Any tag carrying itemprop="price", e.g. <meta itemprop="price" content="450">
+# or <span itemprop="price">Rs. 450</span>
+ITEMPROP_PRICE_RE = re.compile(rb'<[^>]*\bitemprop=["\']price["\'][^>]*>', re.IGNORECASE)
+# Open Graph product price, e.g. <meta property="product:price:amount" content="450">
+META_PRICE_RE = re.compile(rb'<meta[^>]*\bproperty=["\'](?:product|og):price:amount["\'][^>]*>', re.IGNORECASE)
+CONTENT_RE = re.compile(rb'\bcontent=["\']([^"\']*)["\']', re.IGNORECASE)
+
+# Raw byte sequences showing a microdata price has arrived, for streaming downloads
+STREAM_SIGNALS = [b'itemprop="price"', b"itemprop='price'", b'price:amount']
+
+OFFER_TYPES = ('Offer', 'AggregateOffer')
+# Keys checked in order; an AggregateOffer only has a price range
+OFFER_PRICE_KEYS = ('price', 'lowPrice')
+
+
+def _is_offer(node: dict) -> bool:
+    offer_type = node.get('@type')
+    types = offer_type if isinstance(offer_type, list) else [offer_type]
+    return any(t in OFFER_TYPES for t in types)
+
+
+def _offer_prices(data: Any) -> Iterator[str]:
+    # Breadth-first, so the page's main Product offer comes before any nested ones
+    queue = deque([data])
+    while queue:
+        node = queue.popleft()
+        if isinstance(node, dict):
+            if _is_offer(node):
+                for key in OFFER_PRICE_KEYS:
+                    value = node.get(key)
+                    if isinstance(value, (int, float, str)) and not isinstance(value, bool):
+                        yield str(value)
+            queue.extend(node.values())
+        elif isinstance(node, list):
+            queue.extend(node)
+
+
+def ld_json_prices(html_content: bytes, encoding: str = 'utf-8') -> Iterator[str]:
+    """
+    Offer prices from schema.org JSON-LD blocks, in document order
+    """
+    for match in LD_JSON_RE.finditer(html_content):
+        try:
+            data = json.loads(match.group(1).decode(encoding, errors='replace'))
+        except ValueError as e:
+            logger.debug(f"Skipping unparsable JSON-LD block: {e}")
+            continue
+        yield from _offer_prices(data)
+
+
+def microdata_prices(html_content: bytes, encoding: str = 'utf-8') -> Iterator[str]:
+    """
+    Prices from itemprop="price" tags (their content attribute, else their
+    text) and from product:price:amount meta tags
+    """
+    for match in ITEMPROP_PRICE_RE.finditer(html_content):
+        content = CONTENT_RE.search(match.group(0))
+        if content:
+            yield content.group(1).decode(encoding, errors='replace')
+        else:
+            # Only a complete text node: the page may still be downloading
+            end = html_content.find(b'<', match.end())
+            if end != -1:
+                yield html_content[match.end():end].decode(encoding, errors='replace')
+    for match in META_PRICE_RE.finditer(html_content):
+        content = CONTENT_RE.search(match.group(0))
+        if content:
+            yield content.group(1).decode(encoding, errors='replace')
+
+
+def structured_prices(html_content: bytes, encoding: str = 'utf-8') -> Iterator[str]:
+    """
+    Candidate price strings from the page's structured product data: JSON-LD
+    first, then microdata. Found with targeted regex scans of the raw bytes,
+    without decoding or parsing the page; only the matches are decoded.
+    """
+    yield from ld_json_prices(html_content, encoding)
+    yield from microdata_prices(html_content, encoding)
@@ -1,12 +1,13 @@
 import csv
 import requests
-from bs4 import BeautifulSoup
 import time
 import re
 from urllib.parse import urlparse
 import logging
 from typing import List, Dict, Optional, Tuple
 
+from parser_backend import get_parser_backend, make_soup
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -22,13 +23,15 @@ class CompetitorPriceScraper:
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
+        # BeautifulSoup tree builder (PARSER_BACKEND, falling back to html.parser)
+        self.parser_backend = get_parser_backend()
         self.results = []
         
     def extract_price_from_html(self, html_content: str, competitor_name: str) -> Optional[str]:
         """
         Extract price from HTML content based on competitor-specific patterns
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = make_soup(html_content, self.parser_backend)
         
         # Remove script and style elements
         for script in soup(["script", "style"]):
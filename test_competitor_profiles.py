@@ -0,0 +1,51 @@
+from competitor_profiles import get_profile
+from scraper_config import PRESCAN_WINDOW
+
+HEAD = (
+    b'<html><head><meta charset="utf-8">'
+    b'<style>.price-box { float: right; } .price-box .price { font-weight: bold; }</style>'
+    b'<script>var template = \'<div class="price-box"><span class="price">Rs. 99</span></div>\';</script>'
+    b'<!-- <div class="price-box"><span class="price">Rs. 75</span></div> -->'
+    b'</head><body>'
+)
+# Pushes the product block past the first PRESCAN_WINDOW bytes of the page
+FILLER = b'<ul class="menu">' + b'<li><a href="/category">Category</a></li>' * 150 + b'</ul>'
+PRODUCT = b'<div class="price-box"><span class="price">Rs. 1,150</span></div>'
+PAGE = HEAD + FILLER + PRODUCT + FILLER + b'</body></html>'
+
+
+def test_page_is_larger_than_the_window():
+    assert len(PAGE) > 2 * PRESCAN_WINDOW
+    assert PAGE.index(PRODUCT) > PRESCAN_WINDOW
+
+
+def test_marker_window_skips_inline_css_js_and_comments():
+    window = get_profile('Diamond').marker_window(PAGE)
+    assert window.startswith(PRODUCT)
+
+
+def test_extract_price_ignores_markup_in_scripts():
+    for partial in (False, True):
+        price, selector = get_profile('Diamond').extract_price(PAGE, 'html.parser', partial=partial)
+        assert (price, selector) == ('1150.00', '.price')
+
+
+def test_stream_scanner_waits_for_the_real_marker():
+    scanner = get_profile('Diamond').stream_scanner()
+    buffer = bytearray()
+    ready_at = None
+    for start in range(0, len(PAGE), 1000):
+        buffer += PAGE[start:start + 1000]
+        if scanner.ready(buffer):
+            ready_at = len(buffer)
+            break
+    assert ready_at is not None
+    assert ready_at >= PAGE.index(PRODUCT) + PRESCAN_WINDOW
+
+
+def test_marker_split_across_chunks():
+    scanner = get_profile('Diamond').stream_scanner()
+    cut = PAGE.index(PRODUCT) + len(b'<div class="price-')
+    assert not scanner.ready(bytearray(PAGE[:cut]))
+    assert scanner.ready(bytearray(PAGE))
+    assert scanner.marker_end == PAGE.index(PRODUCT) + PRESCAN_WINDOW
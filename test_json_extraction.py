@@ -1,7 +1,8 @@
 import requests
-from bs4 import BeautifulSoup
 import re
 
+from parser_backend import make_soup
+
 def test_json_extraction():
     """Test JSON extraction from Metro pages"""
     
@@ -20,7 +21,7 @@ def test_json_extraction():
         response = requests.get(url, headers=headers, timeout=30)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = make_soup(response.text)
         
         print(f"Page content length: {len(response.text)} characters")
         
@@ -0,0 +1,50 @@
+import json
+import os
+
+import pytest
+
+from competitor_profiles import get_profile
+from parser_backend import BACKEND_MODULES, is_available, make_soup
+from scraper_config import PRESCAN_WINDOW
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+with open(os.path.join(FIXTURE_DIR, 'expected_prices.json'), 'r', encoding='utf-8') as file:
+    EXPECTED_PRICES = json.load(file)
+
+BACKENDS = [backend for backend in BACKEND_MODULES if is_available(backend)]
+
+
+def read_fixture(name: str) -> bytes:
+    # Raw bytes, as the scrapers receive them
+    with open(os.path.join(FIXTURE_DIR, name), 'rb') as file:
+        return file.read()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('name', sorted(EXPECTED_PRICES))
+def test_fixture_price(name, backend):
+    competitor = name.split('__', 1)[0]
+    price, _ = get_profile(competitor).extract_price(read_fixture(name), backend)
+    assert price == EXPECTED_PRICES[name]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('name', sorted(EXPECTED_PRICES))
+def test_fixture_price_from_full_tree(name, backend):
+    # The selector sweep over the whole page, without the JSON, structured
+    # data and marker window fast paths
+    competitor = name.split('__', 1)[0]
+    soup = make_soup(read_fixture(name), backend)
+    price, _ = get_profile(competitor)._extract_from_soup(soup, None)
+    assert price == EXPECTED_PRICES[name]
+
+
+def test_every_fixture_has_an_expected_price():
+    fixtures = {name for name in os.listdir(FIXTURE_DIR) if name.endswith('.html')}
+    assert fixtures == set(EXPECTED_PRICES)
+
+
+def test_every_competitor_has_a_page_larger_than_the_window():
+    large = {name.split('__', 1)[0] for name in EXPECTED_PRICES if len(read_fixture(name)) > PRESCAN_WINDOW}
+    assert large == {name.split('__', 1)[0] for name in EXPECTED_PRICES}
@@ -0,0 +1,24 @@
+from price_patterns import extract_price_from_text, price_candidates
+
+
+def test_prefixed_price():
+    assert extract_price_from_text("Sale Rs. 1,250.00 only") == "1250.00"
+    assert extract_price_from_text("PKR450") == "450"
+
+
+def test_suffixed_price():
+    assert extract_price_from_text("Now 899 Rs") == "899"
+    assert extract_price_from_text("Pack of 6, 1,200 PKR") == "1200"
+
+
+def test_bare_price():
+    assert extract_price_from_text("Price: 350") == "350"
+
+
+def test_suffix_does_not_swallow_next_prefix():
+    assert list(price_candidates("Price 500 Rs 450")) == [(1, "500"), (0, "450")]
+    assert extract_price_from_text("Price 500 Rs 450") == "450"
+
+
+def test_invalid_prices_are_skipped():
+    assert extract_price_from_text("Rs 0 or 250000") is None
@@ -0,0 +1,30 @@
+from scraper_config import DEAD_SELECTOR_MIN_PAGES
+from selector_stats import NEXT_DATA, PAGE_TEXT, STRUCTURED_DATA, SelectorStats
+
+SELECTORS = ['.price', '.amount']
+
+
+def test_pages_won_before_the_selectors_dont_make_them_dead(tmp_path):
+    stats = SelectorStats('test', stats_dir=str(tmp_path))
+    for _ in range(DEAD_SELECTOR_MIN_PAGES):
+        stats.record('Naheed', STRUCTURED_DATA)
+        stats.record('Naheed', NEXT_DATA)
+    assert stats.dead_selectors('Naheed', SELECTORS) == []
+
+
+def test_selectors_without_hits_are_dead_after_enough_sweeps(tmp_path):
+    stats = SelectorStats('test', stats_dir=str(tmp_path))
+    stats.record('Diamond', '.price')
+    for _ in range(DEAD_SELECTOR_MIN_PAGES // 2):
+        stats.record('Diamond', None)
+        stats.record('Diamond', PAGE_TEXT)
+    assert stats.dead_selectors('Diamond', SELECTORS) == ['.amount']
+
+
+def test_counts_survive_a_save(tmp_path):
+    stats = SelectorStats('test', stats_dir=str(tmp_path))
+    stats.record('Diamond', '.price')
+    stats.record('Diamond', STRUCTURED_DATA)
+    stats.save()
+    loaded = SelectorStats('test', stats_dir=str(tmp_path))
+    assert loaded.data['Diamond'] == {'pages': 2, 'swept': 1, 'hits': {'.price': 1, STRUCTURED_DATA: 1}}
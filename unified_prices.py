@@ -0,0 +1,79 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# The original wide table (one price / link column pair per competitor), kept
+# only to be migrated by price_store.py
+TABLE = 'unified_competitor_prices'
+SKU_INDEX = 'uniq_sku'
+# Serialises schema migrations between scrapers started together
+MIGRATION_LOCK = 'unified_competitor_prices_migration'
+MIGRATION_LOCK_TIMEOUT = 60
+
+
+def _has_sku_index(cursor) -> bool:
+    cursor.execute(f"SHOW INDEX FROM {TABLE} WHERE Key_name = %s", (SKU_INDEX,))
+    return cursor.fetchone() is not None
+
+
+def _merge_duplicate_skus(cursor) -> int:
+    """
+    Fold every group of rows sharing a SKU into its newest row. A column
+    keeps the newest non-empty value found in the group, so prices written
+    by different scrapers into different duplicate rows all survive.
+    """
+    cursor.execute(f"SELECT SKU FROM {TABLE} WHERE SKU IS NOT NULL GROUP BY SKU HAVING COUNT(*) > 1")
+    skus = [row[0] for row in cursor.fetchall()]
+    if not skus:
+        return 0
+
+    cursor.execute(f"SELECT * FROM {TABLE} LIMIT 0")
+    names = [column[0] for column in cursor.description]
+    value_names = [name for name in names if name not in ('id', 'SKU')]
+
+    removed = 0
+    for sku in skus:
+        cursor.execute(f"SELECT * FROM {TABLE} WHERE SKU = %s ORDER BY id", (sku,))
+        rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+        merged = {}
+        for row in rows:
+            for name in value_names:
+                if row[name] not in (None, ''):
+                    merged[name] = row[name]
+        keep_id = rows[-1]['id']
+        if merged:
+            assignments = ', '.join(f"{name} = %s" for name in merged)
+            cursor.execute(f"UPDATE {TABLE} SET {assignments} WHERE id = %s", (*merged.values(), keep_id))
+        cursor.execute(f"DELETE FROM {TABLE} WHERE SKU = %s AND id <> %s", (sku, keep_id))
+        removed += cursor.rowcount
+    logger.info(f"Merged {len(skus)} duplicated SKUs ({removed} duplicate rows removed)")
+    return removed
+
+
+def ensure_sku_index(conn):
+    """
+    Make SKU unique in the unified table, merging the duplicate rows earlier
+    runs left behind first. Safe to call from several scrapers at once: the
+    migration runs under a MySQL named lock and is skipped once the index exists.
+    """
+    cursor = conn.cursor()
+    try:
+        if _has_sku_index(cursor):
+            return
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError(f"Timed out waiting for the {TABLE} migration lock")
+        try:
+            # Another scraper may have migrated while we waited for the lock
+            if _has_sku_index(cursor):
+                return
+            logger.info(f"Adding unique SKU index to {TABLE}...")
+            _merge_duplicate_skus(cursor)
+            conn.commit()
+            cursor.execute(f"ALTER TABLE {TABLE} ADD UNIQUE KEY {SKU_INDEX} (SKU)")
+            logger.info(f"✅ Unique SKU index added to {TABLE}")
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
@@ -0,0 +1,127 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+
+from main import CompetitorPriceScraper
+from parser_backend import BACKEND_MODULES, is_available
+
+# Committed synthetic pages; --download saves live pages to DOWNLOAD_DIR instead
+FIXTURE_DIR = 'fixtures'
+DOWNLOAD_DIR = 'downloaded_fixtures'
+# Known price of each committed fixture, checked by verify() and test_parser_backends.py
+EXPECTED_PRICES_FILE = 'expected_prices.json'
+CSV_FILE = "Cartpk competitors link(Developer Sample File).csv"
+COMPETITOR_COLUMNS = {'Diamond': 3, 'Naheed': 4, 'Metro': 5}
+
+
+def fixture_name(competitor: str, url: str) -> str:
+    """
+    File name for a saved page: '<Competitor>__<url slug>.html'
+    """
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', url.split('://', 1)[-1]).strip('-')[:150]
+    return f"{competitor}__{slug}.html"
+
+
+def download_fixtures(scraper: CompetitorPriceScraper, fixture_dir: str):
+    """
+    Save every product page linked from the sample CSV into the fixture directory
+    """
+    os.makedirs(fixture_dir, exist_ok=True)
+    with open(CSV_FILE, 'r', encoding='utf-8') as file:
+        rows = list(csv.reader(file))
+    for row in rows[2:]:
+        if len(row) < 6 or not row[0].strip():
+            continue
+        for competitor, column in COMPETITOR_COLUMNS.items():
+            url = row[column].strip()
+            if not url:
+                continue
+            path = os.path.join(fixture_dir, fixture_name(competitor, url))
+            try:
+                response = scraper.session.get(url, timeout=30)
+                response.raise_for_status()
+            except Exception as e:
+                print(f"❌ {competitor}: {url} - {e}")
+                continue
+            with open(path, 'wb') as out:
+                out.write(response.content)
+            print(f"✅ Saved {path}")
+
+
+def load_expected_prices(fixture_dir: str) -> dict:
+    """
+    Expected price by fixture name; pages saved with --download have none
+    """
+    try:
+        with open(os.path.join(fixture_dir, EXPECTED_PRICES_FILE), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def verify(scraper: CompetitorPriceScraper, fixture_dir: str) -> bool:
+    """
+    Extract a price from every fixture with each available backend and report
+    any page where the backends disagree or miss the fixture's expected price
+    """
+    backends = [backend for backend in BACKEND_MODULES if is_available(backend)]
+    fixtures = sorted(name for name in os.listdir(fixture_dir) if name.endswith('.html'))
+    expected = load_expected_prices(fixture_dir)
+    if not fixtures:
+        print(f"❌ No fixtures found in {fixture_dir} (run with --download first)")
+        return False
+    print(f"Comparing backends {backends} on {len(fixtures)} fixtures")
+
+    cpu_time = {backend: 0.0 for backend in backends}
+    mismatches = 0
+    for name in fixtures:
+        competitor = name.split('__', 1)[0]
+        # Raw bytes, as the scrapers receive them
+        with open(os.path.join(fixture_dir, name), 'rb') as file:
+            html_content = file.read()
+        prices = {}
+        for backend in backends:
+            scraper.parser_backend = backend
+            start = time.process_time()
+            prices[backend] = scraper.extract_price_from_html(html_content, competitor)
+            cpu_time[backend] += time.process_time() - start
+        if len(set(prices.values())) > 1:
+            mismatches += 1
+            print(f"❌ {name}: {prices}")
+        elif name in expected and prices[backends[0]] != expected[name]:
+            mismatches += 1
+            print(f"❌ {name}: {prices[backends[0]]} (expected {expected[name]})")
+        else:
+            print(f"✅ {name}: {prices[backends[0]]}")
+
+    print("\nCPU time per backend:")
+    for backend in backends:
+        print(f"   - {backend}: {cpu_time[backend]:.3f}s")
+    if mismatches:
+        print(f"\n❌ {mismatches} fixture(s) gave different or unexpected prices")
+        return False
+    print("\n🎉 All backends extracted identical (and expected) prices")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify parser backends give identical prices")
+    parser.add_argument('fixture_dir', nargs='?',
+                        help=f"default: {FIXTURE_DIR}, or {DOWNLOAD_DIR} with --download")
+    parser.add_argument('--download', action='store_true',
+                        help="first save the sample CSV's product pages as fixtures")
+    args = parser.parse_args()
+    fixture_dir = args.fixture_dir or (DOWNLOAD_DIR if args.download else FIXTURE_DIR)
+
+    scraper = CompetitorPriceScraper()
+    if args.download:
+        download_fixtures(scraper, fixture_dir)
+    sys.exit(0 if verify(scraper, fixture_dir) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+from scraper_config import (
+    METRO_DRIVER_POOL_SIZE, METRO_DRIVER_MAX_PAGES, METRO_PAGE_LOAD_TIMEOUT,
+    METRO_PAGE_LOAD_STRATEGY, METRO_BLOCKED_URLS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class WebDriverPool:
+    """
+    Pool of long-lived headless Chrome drivers.
+
+    Drivers are started lazily (at most `size` at a time), handed out with
+    `acquire()` and returned with `release()`. A driver is quit and replaced
+    after `max_pages` page loads, or immediately when released as broken.
+
+    Chrome is started with the `eager` page-load strategy and blocks images,
+    media, fonts and trackers (METRO_BLOCKED_URLS) through DevTools. Pages
+    loaded with `load()` are timed; `close()` logs a summary.
+    """
+
+    def __init__(self, size: int = METRO_DRIVER_POOL_SIZE, max_pages: int = METRO_DRIVER_MAX_PAGES,
+                 page_load_timeout: int = METRO_PAGE_LOAD_TIMEOUT):
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.page_load_timeout = page_load_timeout
+        self.driver_path: Optional[str] = None
+        self.idle: queue.Queue = queue.Queue()
+        self.page_counts: Dict[int, int] = {}
+        self.slots = threading.BoundedSemaphore(self.size)
+        self.lock = threading.Lock()
+        self.timings: List[Tuple[str, float]] = []
+
+    def _get_driver_path(self) -> str:
+        # ChromeDriverManager().install() hits the network, so resolve it only once
+        with self.lock:
+            if self.driver_path is None:
+                self.driver_path = ChromeDriverManager().install()
+            return self.driver_path
+
+    def _create_driver(self):
+        chrome_options = Options()
+        chrome_options.add_argument('--headless')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--window-size=1920,1080')
+        # Keep background tabs loading and running timers at full speed
+        chrome_options.add_argument('--disable-background-timer-throttling')
+        chrome_options.add_argument('--disable-renderer-backgrounding')
+        chrome_options.add_argument('--disable-backgrounding-occluded-windows')
+        chrome_options.page_load_strategy = METRO_PAGE_LOAD_STRATEGY
+        # Don't even decode images if a request slips past the URL blocklist
+        chrome_options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+        service = Service(self._get_driver_path())
+        driver = webdriver.Chrome(service=service, options=chrome_options)
+        driver.set_page_load_timeout(self.page_load_timeout)
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': METRO_BLOCKED_URLS})
+        except Exception as e:
+            logger.warning(f"Could not set up request blocking in Chrome: {e}")
+        self.page_counts[id(driver)] = 0
+        logger.info("Started a new Chrome driver for the pool")
+        return driver
+
+    def _quit_driver(self, driver):
+        self.page_counts.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Error quitting Chrome driver: {e}")
+
+    def acquire(self):
+        """
+        Borrow a driver, reusing an idle one or starting a new one.
+        Blocks while all `size` drivers are in use.
+        """
+        self.slots.acquire()
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._create_driver()
+        except Exception:
+            self.slots.release()
+            raise
+
+    def release(self, driver, broken: bool = False, pages: int = 1):
+        """
+        Return a borrowed driver after `pages` page loads. Broken drivers and
+        drivers that reached `max_pages` are quit; the next borrower starts a
+        fresh one.
+        """
+        self.page_counts[id(driver)] = self.page_counts.get(id(driver), 0) + pages
+        if broken or self.page_counts[id(driver)] >= self.max_pages:
+            reason = "after a failure" if broken else f"after {self.max_pages} pages"
+            logger.info(f"Recycling Chrome driver {reason}")
+            self._quit_driver(driver)
+        else:
+            self.idle.put(driver)
+        self.slots.release()
+
+    def load(self, driver, url: str):
+        """
+        Navigate a borrowed driver to a URL and record how long the load took
+        """
+        start = time.monotonic()
+        try:
+            driver.get(url)
+        finally:
+            self.record_timing(url, time.monotonic() - start)
+
+    def record_timing(self, url: str, elapsed: float):
+        """
+        Record how long a page took to load
+        """
+        with self.lock:
+            self.timings.append((url, elapsed))
+        logger.info(f"Metro page loaded in {elapsed:.2f}s: {url}")
+
+    def log_timings(self):
+        """
+        Log the number, mean and slowest of the page loads so far
+        """
+        with self.lock:
+            timings = list(self.timings)
+        if not timings:
+            return
+        slowest_url, slowest = max(timings, key=lambda timing: timing[1])
+        mean = sum(elapsed for _, elapsed in timings) / len(timings)
+        logger.info(f"Metro page loads: {len(timings)}, mean {mean:.2f}s, slowest {slowest:.2f}s ({slowest_url})")
+
+    def close(self):
+        """
+        Log the page-load timings and quit every idle driver in the pool
+        """
+        self.log_timings()
+        while True:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit_driver(driver)